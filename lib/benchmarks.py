@@ -0,0 +1,500 @@
+import os
+import time
+import json
+import pickle
+
+import numpy as np
+
+import skimage.io
+import skimage.transform
+import skimage.segmentation
+
+from PIL import Image
+
+from lib.frame_grabber import frame_from_pixel_buffer
+from lib.glyph_templates import GlyphTemplateClassifier, load_labeled_tokens
+
+import lib.ocr
+import lib.trigonometry
+
+from plugins.SuperHexagonGameAgentPlugin.files.helpers.frame_processing import *
+from plugins.SuperHexagonGameAgentPlugin.files.helpers.ray_casting import RayCaster
+from plugins.SuperHexagonGameAgentPlugin.files.helpers.context_tracking import ContextTracker
+
+
+FIXTURES = {
+    "splash": "datasets/frame_splash.png",
+    "game_board": "datasets/frame_game_board.png",
+    "credits": "datasets/frame_credits.png"
+}
+
+# Super Hexagon screen regions at the fixtures' native 768x480 resolution
+SCREEN_REGIONS = {
+    "SPLASH_ACTIONS": (349, 260, 391, 507),
+    "GAME_PLAYER_AREA": (129, 264, 366, 513),
+    "DEATH_TIME_LAST": (158, 600, 207, 768)
+}
+
+OCR_CLASSIFIER_PATH = "plugins/SuperHexagonGameAgentPlugin/files/ml_models/super_hexagon_ocr.model"
+CONTEXT_CLASSIFIER_PATH = "plugins/SuperHexagonGameAgentPlugin/files/ml_models/super_hexagon_context.model"
+GLYPH_TEMPLATES_PATH = "datasets/ocr/glyph_templates.npz"
+
+
+def time_function(function, iterations=100):
+    started_at = time.perf_counter()
+
+    for _ in range(iterations):
+        function()
+
+    return (time.perf_counter() - started_at) / iterations
+
+
+def synthetic_pixel_buffer(width, height, has_alpha=False, row_padding=8):
+    channels = 4 if has_alpha else 3
+    rowstride = (width * channels) + row_padding
+
+    pixel_data = np.random.randint(0, 256, size=rowstride * height).astype("uint8").tobytes()
+
+    return pixel_data, rowstride
+
+
+def benchmark_frame_conversion(width=768, height=480, has_alpha=False, iterations=100):
+    """Pixbuf to consumer frame: the previous PIL based path against the strided view path (Redis transport in both cases)"""
+    pixel_data, rowstride = synthetic_pixel_buffer(width, height, has_alpha=has_alpha)
+    shape = (height, width, 3)
+    mode = "RGBA" if has_alpha else "RGB"
+
+    def legacy_conversion():
+        pil_frame = Image.frombytes(mode, (width, height), pixel_data, "raw", mode, rowstride)  # Copy
+        frame = np.array(pil_frame)  # Copy
+        frame_bytes = frame.tobytes()  # Copy
+        return np.fromstring(frame_bytes, dtype="uint8").reshape(frame.shape)  # Copy
+
+    def strided_conversion():
+        frame = frame_from_pixel_buffer(pixel_data, width, height, rowstride, has_alpha=has_alpha)  # View
+        frame_bytes = frame.tobytes()  # Copy (unavoidable when publishing)
+        return np.frombuffer(frame_bytes, dtype="uint8").reshape(shape)  # View
+
+    pixels = np.frombuffer(pixel_data, dtype="uint8")
+    strided_frame = frame_from_pixel_buffer(pixel_data, width, height, rowstride, has_alpha=has_alpha)
+
+    # The publishing tobytes() is the only copy left when the strided frame is a view over the pixbuf
+    strided_copies = int(not np.shares_memory(strided_frame, pixels)) + 1
+
+    if not np.array_equal(legacy_conversion()[..., :3], strided_conversion()):
+        raise ValueError("The strided frame conversion does not match the legacy conversion...")
+
+    return {
+        "shape": shape,
+        "frame_bytes": int(np.prod(shape)),
+        "legacy": {
+            "seconds_per_frame": time_function(legacy_conversion, iterations=iterations),
+            "copies_per_frame": 4
+        },
+        "strided": {
+            "seconds_per_frame": time_function(strided_conversion, iterations=iterations),
+            "copies_per_frame": strided_copies
+        }
+    }
+
+
+def benchmark_suite(scales=(0.5, 1.0, 1.5), iterations=10):
+    """Times the OCR, frame processing, ray casting and trigonometry stages on the dataset fixtures at several resolutions"""
+    ocr_classifier = load_ocr_classifier()
+    # The template engine is only timed once a template bank has been built (invoke build_glyph_templates)
+    glyph_classifier = load_glyph_classifier()
+
+    results = dict()
+
+    for fixture_name, fixture_path in FIXTURES.items():
+        fixture_frame = skimage.io.imread(fixture_path)[..., :3]
+
+        for scale in scales:
+            frame = scale_frame(fixture_frame, scale)
+            prefix = f"{fixture_name}@{frame.shape[1]}x{frame.shape[0]}"
+
+            for name, seconds in benchmark_frame(frame, scale, ocr_classifier, glyph_classifier=glyph_classifier, iterations=iterations).items():
+                results[f"{prefix}/{name}"] = seconds
+
+    for scale in scales:
+        shape = (int(round(480 * scale)), int(round(768 * scale)))
+
+        for name, seconds in benchmark_trigonometry(shape, iterations=max(1, iterations // 5)).items():
+            results[f"tables@{shape[1]}x{shape[0]}/{name}"] = seconds
+
+    return results
+
+
+def benchmark_frame(frame, scale, ocr_classifier, glyph_classifier=None, iterations=10):
+    results = dict()
+
+    regions = {name: tuple(int(round(c * scale)) for c in region) for name, region in SCREEN_REGIONS.items()}
+
+    if glyph_classifier is not None:
+        results["ocr.words_in_image_region (templates)"] = time_function(
+            lambda: lib.ocr.words_in_image_region(frame, regions["SPLASH_ACTIONS"], glyph_classifier, word_window_size=(1, 8), use_cache=False),
+            iterations=iterations
+        )
+
+    results["ocr.words_in_image_region"] = time_function(
+        lambda: lib.ocr.words_in_image_region(frame, regions["SPLASH_ACTIONS"], ocr_classifier, word_window_size=(1, 8), use_cache=False),
+        iterations=iterations
+    )
+
+    results["ocr.words_in_image_region (cached)"] = time_function(
+        lambda: lib.ocr.words_in_image_region(frame, regions["SPLASH_ACTIONS"], ocr_classifier, word_window_size=(1, 8)),
+        iterations=iterations
+    )
+
+    for name, seconds in benchmark_normalize_objects(frame, iterations=iterations).items():
+        results[f"ocr.normalize_objects ({name})"] = seconds
+
+    for name, seconds in benchmark_bounding_boxes(frame, ocr_classifier, iterations=iterations).items():
+        results[f"ocr.{name}"] = seconds
+
+    results["ocr.words_in_image_regions"] = time_function(
+        lambda: lib.ocr.words_in_image_regions(frame, [regions["SPLASH_ACTIONS"], regions["DEATH_TIME_LAST"]], ocr_classifier, word_window_size=(1, 8)),
+        iterations=iterations
+    )
+
+    gray_frame = grayscale_frame(frame)
+
+    results["grayscale_frame"] = time_function(lambda: grayscale_frame(frame), iterations=iterations)
+    results["process_frame_for_context"] = time_function(lambda: process_frame_for_context(gray_frame), iterations=iterations)
+    results["process_frame_for_context (downscale 4)"] = time_function(lambda: process_frame_for_context(gray_frame, downscale=4), iterations=iterations)
+    results["process_frame_for_game_play"] = time_function(lambda: process_frame_for_game_play(gray_frame.copy()), iterations=iterations)
+
+    game_play_frame_processor = GamePlayFrameProcessor(frame.shape)
+
+    results["GamePlayFrameProcessor.grayscale"] = time_function(lambda: game_play_frame_processor.grayscale(frame), iterations=iterations)
+    results["GamePlayFrameProcessor.process"] = time_function(lambda: game_play_frame_processor.process(gray_frame), iterations=iterations)
+
+    bw_frame = process_frame_for_game_play(gray_frame.copy())
+
+    if bw_frame is None:
+        return results
+
+    results["get_player_character_bounding_box"] = time_function(
+        lambda: get_player_character_bounding_box(bw_frame, regions["GAME_PLAYER_AREA"]),
+        iterations=iterations
+    )
+
+    angles_to_center = lib.trigonometry.angles_to_center(bw_frame.shape)
+    distances_to_center = lib.trigonometry.distances_to_center(bw_frame.shape)
+
+    ray_caster = RayCaster(angles_to_center, distances_to_center)
+    rays = {f"Ray {angle}": angle for angle in range(-150, 181, 30)}
+
+    results["ray_casting (masks)"] = time_function(
+        lambda: cast_rays_with_masks(bw_frame, rays, angles_to_center, distances_to_center),
+        iterations=iterations
+    )
+
+    results["ray_casting (lookup tables)"] = time_function(lambda: ray_caster.cast_rays(bw_frame, rays), iterations=iterations)
+
+    return results
+
+
+def benchmark_normalize_objects(frame, iterations=10):
+    """Character token normalization: the previous pad-and-resize loop against the vectorized gather; raises if the tokens differ"""
+    preprocessed_frame = lib.ocr.preprocess_image(frame, mode="PRECISE")
+    objects = lib.ocr.detect_image_objects_closing(preprocessed_frame, window_size=1, merge=True)
+
+    legacy_tokens = np.array(legacy_normalize_objects(preprocessed_frame, objects)).reshape(-1, 16, 16)
+    tokens = lib.ocr.normalize_objects(preprocessed_frame, objects)
+
+    if not np.array_equal(legacy_tokens, tokens):
+        raise ValueError("The vectorized token normalization does not match the legacy normalization...")
+
+    return {
+        "legacy": time_function(lambda: legacy_normalize_objects(preprocessed_frame, objects), iterations=iterations),
+        "vectorized": time_function(lambda: lib.ocr.normalize_objects(preprocessed_frame, objects), iterations=iterations)
+    }
+
+
+def legacy_normalize_objects(image, objects):
+    # Previous lib.ocr.normalize_objects (as run against the pinned scikit-image)
+    cleared_image = skimage.segmentation.clear_border(image)
+
+    tokens = list()
+    final_size = (16, 16)
+
+    for region in objects:
+        width, height = [region[3] - region[1], region[2] - region[0]]
+
+        token = cleared_image[region[0]:region[2], region[1]:region[3]]
+
+        if width > height:
+            diff = (width - height) - 1
+            i = 0
+
+            while i <= diff:
+                token = np.r_[token, np.zeros((1, width))]
+                i += 1
+        elif height > width:
+            diff = (height - width) - 1
+            i = 0
+
+            while i <= diff:
+                token = np.c_[token, np.zeros((height, 1))]
+                i += 1
+
+        token = skimage.transform.resize(token, output_shape=final_size, mode="reflect", order=0)
+        tokens.append(token)
+
+    return tokens
+
+
+def benchmark_bounding_boxes(frame, ocr_classifier, iterations=10):
+    """Nesting removal and word reconstruction: the previous all-pairs loops against BoundingBoxIndex; raises if the results differ"""
+    # Same steps as lib.ocr.extract_character_and_word_data, keeping the word boxes from before nesting removal
+    preprocessed_frame = lib.ocr.preprocess_image(frame, mode="PRECISE")
+
+    character_bounding_boxes = lib.ocr.detect_image_objects_closing(preprocessed_frame, window_size=1, merge=True)
+    character_data = {
+        "bounding_boxes": character_bounding_boxes,
+        "image_data": lib.ocr.normalize_objects(preprocessed_frame, character_bounding_boxes)
+    }
+
+    characters = lib.ocr.classify_characters(character_data, ocr_classifier)
+
+    word_bounding_boxes = lib.ocr.detect_image_objects_closing(preprocessed_frame, shape="rectangle", window_size=(1, 8))
+    clean_word_bounding_boxes = lib.ocr.remove_nested_bounding_boxes(word_bounding_boxes, remove="outer")
+
+    for remove in ["outer", "inner"]:
+        if legacy_remove_nested_bounding_boxes(word_bounding_boxes, remove=remove) != lib.ocr.remove_nested_bounding_boxes(word_bounding_boxes, remove=remove):
+            raise ValueError(f"The indexed nested bounding box removal ({remove}) does not match the legacy removal...")
+
+    if legacy_reconstruct_words(clean_word_bounding_boxes, characters) != lib.ocr.reconstruct_words(clean_word_bounding_boxes, characters):
+        raise ValueError("The indexed word reconstruction does not match the legacy reconstruction...")
+
+    return {
+        "remove_nested_bounding_boxes (legacy)": time_function(lambda: legacy_remove_nested_bounding_boxes(word_bounding_boxes), iterations=iterations),
+        "remove_nested_bounding_boxes (indexed)": time_function(lambda: lib.ocr.remove_nested_bounding_boxes(word_bounding_boxes), iterations=iterations),
+        "reconstruct_words (legacy)": time_function(lambda: legacy_reconstruct_words(clean_word_bounding_boxes, characters), iterations=iterations),
+        "reconstruct_words (indexed)": time_function(lambda: lib.ocr.reconstruct_words(clean_word_bounding_boxes, characters), iterations=iterations)
+    }
+
+
+def legacy_remove_nested_bounding_boxes(bounding_boxes, remove="outer"):
+    # Previous lib.ocr.remove_nested_bounding_boxes
+    bounding_box_blacklist = list()
+
+    for i, bounding_box in enumerate(bounding_boxes):
+        for ii, outer_bounding_box in enumerate(bounding_boxes):
+            if i == ii:
+                continue
+
+            if i in bounding_box_blacklist or ii in bounding_box_blacklist:
+                continue
+
+            is_contained = True
+
+            if bounding_box[0] < outer_bounding_box[0]:
+                is_contained = False
+
+            if bounding_box[1] < outer_bounding_box[1]:
+                is_contained = False
+
+            if bounding_box[2] > outer_bounding_box[2]:
+                is_contained = False
+
+            if bounding_box[3] > outer_bounding_box[3]:
+                is_contained = False
+
+            if is_contained:
+                bounding_box_blacklist.append(ii) if remove == "outer" else bounding_box_blacklist.append(i)
+
+    return [bounding_box for i, bounding_box in enumerate(bounding_boxes) if i not in bounding_box_blacklist]
+
+
+def legacy_reconstruct_words(word_bounding_boxes, characters):
+    # Previous lib.ocr.reconstruct_words
+    words = dict()
+
+    for word_bounding_box in word_bounding_boxes:
+        words[word_bounding_box] = list()
+
+    for bounding_box, character in characters.items():
+        if character == "":
+            continue
+
+        for word_bounding_box in word_bounding_boxes:
+            is_contained = True
+
+            if bounding_box[0] < word_bounding_box[0]:
+                is_contained = False
+
+            if bounding_box[1] < word_bounding_box[1]:
+                is_contained = False
+
+            if bounding_box[2] > word_bounding_box[2]:
+                is_contained = False
+
+            if bounding_box[3] > word_bounding_box[3]:
+                is_contained = False
+
+            if is_contained:
+                words[word_bounding_box].append([bounding_box, character])
+
+    for word_bounding_box, character_data in words.items():
+        y_sorted = sorted(character_data, key=lambda cd: cd[0][0])
+        x_sorted = sorted(y_sorted, key=lambda cd: cd[0][1])
+
+        words[word_bounding_box] = [cd[1] for cd in x_sorted]
+
+    return ["".join(sorted_characters) for word_bounding_box, sorted_characters in words.items() if len(sorted_characters) > 0]
+
+
+def benchmark_ocr_engines(ocr_classifier, labeled_path="datasets/ocr/characters", holdout=0.2, seed=0, iterations=10):
+    """Accuracy of both OCR engines on Redis-annotated tokens held out from template building, and their speed on the fixtures
+
+    The pickled classifier was trained on the whole annotated set, so its accuracy here is an upper bound.
+    """
+    if not os.path.exists(labeled_path):
+        raise ValueError(f"No annotated character tokens found at '{labeled_path}'; OCR accuracy cannot be measured...")
+
+    tokens, labels = load_labeled_tokens(labeled_path)
+
+    is_labeled = np.array([bool(label) for label in labels], dtype=bool)
+
+    if is_labeled.sum() < 2:
+        raise ValueError(f"Not enough Redis-annotated tokens in '{labeled_path}'; OCR accuracy cannot be measured...")
+
+    tokens = tokens[is_labeled]
+    labels = np.array(labels, dtype=object)[is_labeled]
+
+    indices = np.random.RandomState(seed).permutation(len(tokens))
+    test_count = min(max(1, int(round(len(tokens) * holdout))), len(tokens) - 1)
+
+    test_indices, train_indices = indices[:test_count], indices[test_count:]
+
+    glyph_classifier = GlyphTemplateClassifier.from_tokens(tokens[train_indices], labels[train_indices])
+
+    results = {
+        "train_tokens": len(train_indices),
+        "test_tokens": len(test_indices),
+        "accuracy": dict(),
+        "predict_seconds": dict()
+    }
+
+    for engine, classifier in [("classifier", ocr_classifier), ("templates", glyph_classifier)]:
+        predictions = np.array(lib.ocr.predict_characters(tokens[test_indices], classifier), dtype=object)
+
+        results["accuracy"][engine] = float(np.mean(predictions == labels[test_indices]))
+        results["predict_seconds"][engine] = time_function(lambda: lib.ocr.predict_characters(tokens[test_indices], classifier), iterations=iterations)
+
+    for fixture_name, fixture_path in FIXTURES.items():
+        frame = skimage.io.imread(fixture_path)[..., :3]
+
+        for region_name in ["SPLASH_ACTIONS", "DEATH_TIME_LAST"]:
+            region = SCREEN_REGIONS[region_name]
+            region_image = frame[region[0]:region[2], region[1]:region[3]]
+
+            for engine, classifier in [("classifier", ocr_classifier), ("templates", glyph_classifier)]:
+                results[f"{fixture_name}/{region_name}/{engine}"] = {
+                    "seconds": time_function(
+                        lambda: lib.ocr.words_in_image(region_image, classifier, word_window_size=(1, 8), use_cache=False),
+                        iterations=iterations
+                    ),
+                    "words": lib.ocr.words_in_image(region_image, classifier, word_window_size=(1, 8), use_cache=False)
+                }
+
+    return results
+
+
+def check_context_downscale(downscale, contexts=None):
+    """Classifies the fixtures at full resolution and at `downscale`; raises if the predicted contexts differ"""
+    with open(CONTEXT_CLASSIFIER_PATH, "rb") as f:
+        context_classifier = pickle.loads(f.read())
+
+    contexts = contexts or dict(s="Splash Screen", l="Level Select Screen", g="Game Screen", d="Death Screen")
+
+    full_resolution_tracker = ContextTracker(context_classifier, contexts, downscale=1)
+    downscaled_tracker = ContextTracker(context_classifier, contexts, downscale=downscale)
+
+    results = dict()
+
+    for fixture_name, fixture_path in FIXTURES.items():
+        gray_frame = grayscale_frame(skimage.io.imread(fixture_path)[..., :3])
+
+        results[fixture_name] = {
+            "downscale 1": full_resolution_tracker.classify(gray_frame),
+            f"downscale {downscale}": downscaled_tracker.classify(gray_frame)
+        }
+
+    mismatches = [name for name, contexts in results.items() if len(set(contexts.values())) > 1]
+
+    if len(mismatches):
+        raise ValueError(f"The context classifier disagrees at downscale {downscale} on: {', '.join(mismatches)}...")
+
+    return results
+
+
+def load_ocr_classifier():
+    with open(OCR_CLASSIFIER_PATH, "rb") as f:
+        return pickle.loads(f.read())
+
+
+def load_glyph_classifier():
+    return GlyphTemplateClassifier.load(GLYPH_TEMPLATES_PATH) if os.path.isfile(GLYPH_TEMPLATES_PATH) else None
+
+
+def benchmark_trigonometry(shape, iterations=2):
+    angles_to_center = lib.trigonometry.angles_to_center(shape)
+    distances_to_center = lib.trigonometry.distances_to_center(shape)
+
+    return {
+        "angles_to_center": time_function(lambda: lib.trigonometry.angles_to_center(shape), iterations=iterations),
+        "distances_to_center": time_function(lambda: lib.trigonometry.distances_to_center(shape), iterations=iterations),
+        "RayCaster": time_function(lambda: RayCaster(angles_to_center, distances_to_center), iterations=iterations),
+        "polar_index_map": time_function(lambda: lib.trigonometry.polar_index_map(shape), iterations=iterations)
+    }
+
+
+def cast_rays_with_masks(frame, rays, angles_to_center, distances_to_center):
+    # Previous full-frame mask approach of SuperHexagonGameAgent.handle_play
+    ray_collision_distances = dict()
+
+    for label, angle in rays.items():
+        ray_collision_mask = ((angles_to_center == angle) & (frame == 1))
+        collision_distances = distances_to_center[ray_collision_mask == True]
+
+        ray_collision_distances[label] = np.min(collision_distances) if collision_distances.size else 9999
+
+    return ray_collision_distances
+
+
+def scale_frame(frame, scale):
+    if scale == 1:
+        return frame
+
+    shape = (int(round(frame.shape[0] * scale)), int(round(frame.shape[1] * scale)))
+    return skimage.transform.resize(frame, shape, mode="reflect", order=0, preserve_range=True).astype("uint8")
+
+
+def compare_to_baseline(results, baseline, tolerance=0.2):
+    regressions = dict()
+
+    for name, seconds in results.items():
+        baseline_seconds = baseline.get(name)
+
+        if baseline_seconds and seconds > baseline_seconds * (1 + tolerance):
+            regressions[name] = {"baseline": baseline_seconds, "current": seconds, "ratio": seconds / baseline_seconds}
+
+    return regressions
+
+
+def load_results(file_path):
+    if not os.path.isfile(file_path):
+        return None
+
+    with open(file_path, "r") as f:
+        return json.loads(f.read())
+
+
+def save_results(results, file_path):
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+
+    with open(file_path, "w") as f:
+        f.write(json.dumps(results, indent=4, sort_keys=True))
@@ -0,0 +1,92 @@
+import json
+
+from lib.grayscale import grayscale
+
+
+class CapturePlanError(BaseException):
+    pass
+
+
+class CapturePlan:
+    """Named captures published on every tick: an optional (y0, x0, y1, x1) window region, downscale factor and grayscale flag"""
+
+    FULL_FRAME = "FULL"
+
+    def __init__(self, captures=None):
+        captures = captures or [{"name": self.FULL_FRAME}]
+
+        self.captures = list()
+
+        for capture in captures:
+            if "name" not in capture:
+                raise CapturePlanError("Every capture in a capture plan requires a 'name'...")
+
+            downscale = int(capture.get("downscale") or 1)
+
+            if downscale < 1:
+                raise CapturePlanError(f"Capture '{capture['name']}' has an invalid downscale factor...")
+
+            self.captures.append({
+                "name": capture["name"],
+                "region": tuple(capture["region"]) if capture.get("region") else None,
+                "downscale": downscale,
+                "grayscale": bool(capture.get("grayscale", False))
+            })
+
+        self.names = [capture["name"] for capture in self.captures]
+
+    @classmethod
+    def from_json(cls, captures_json):
+        return cls(json.loads(captures_json) if captures_json else None)
+
+    def to_json(self):
+        return json.dumps(self.captures)
+
+    @property
+    def primary_capture(self):
+        return self.names[0]
+
+    def shapes(self, width, height):
+        shapes = dict()
+
+        for capture in self.captures:
+            y0, x0, y1, x1 = capture["region"] or (0, 0, height, width)
+
+            shape = (-(-(y1 - y0) // capture["downscale"]), -(-(x1 - x0) // capture["downscale"]))
+            shapes[capture["name"]] = shape if capture["grayscale"] else shape + (3,)
+
+        return shapes
+
+    def bounding_region(self, width, height):
+        regions = [capture["region"] or (0, 0, height, width) for capture in self.captures]
+
+        return (
+            min(region[0] for region in regions),
+            min(region[1] for region in regions),
+            max(region[2] for region in regions),
+            max(region[3] for region in regions)
+        )
+
+    def apply(self, frame, frame_region=None):
+        """Slices every capture out of a frame covering frame_region of the game window"""
+        offset_y, offset_x = (frame_region[0], frame_region[1]) if frame_region else (0, 0)
+
+        captures = dict()
+
+        for capture in self.captures:
+            if capture["region"] is None:
+                capture_frame = frame
+            else:
+                y0, x0, y1, x1 = capture["region"]
+                capture_frame = frame[y0 - offset_y:y1 - offset_y, x0 - offset_x:x1 - offset_x]
+
+            if capture["downscale"] > 1:
+                capture_frame = capture_frame[::capture["downscale"], ::capture["downscale"]]
+
+            if capture["grayscale"]:
+                capture_frame = grayscale(capture_frame)
+
+            captures[capture["name"]] = capture_frame
+
+        return captures
+
@@ -1,48 +1,94 @@
 import numpy as np
 
-from PIL import Image
+import time
 
 import gi
 gi.require_version('Gdk', '3.0')
 
 from gi.repository import Gdk
 
-from redis import StrictRedis
+from lib.frame_pacer import FramePacer
+from lib.capture_plan import CapturePlan
+
+from lib.frame_transports import frame_transports_for_capture_plan
 
 from lib.config import config
 
 
 class FrameGrabber:
 
-    def __init__(self, width=640, height=480, x_offset=0, y_offset=0):
+    def __init__(self, width=640, height=480, x_offset=0, y_offset=0, frame_rate=None, capture_plan=None, frame_transports=None):
         self.width = width
         self.height = height
 
         self.x_offset = x_offset
         self.y_offset = y_offset
 
-        self.redis_client = StrictRedis(**config["redis"])
+        self.capture_plan = capture_plan or CapturePlan()
+        self.capture_region = self.capture_plan.bounding_region(self.width, self.height)
+
+        self.frame_transports = frame_transports or frame_transports_for_capture_plan(self.capture_plan, self.width, self.height)
 
         # Clear any previously stored frames
-        self.redis_client.delete(config["frame_grabber"]["redis_key"])
+        for frame_transport in self.frame_transports.values():
+            frame_transport.clear()
+
+        self.sequence_number = 0
+
+        self.frame_pacer = FramePacer(frame_rate=frame_rate)
+        self.report_interval = config["frame_grabber"].get("report_interval") or 0
+
+        self.is_running = False
 
     def start(self):
-        while True:
-            self.redis_client.set(config["frame_grabber"]["redis_key"], self.grab_frame().tobytes())
+        last_reported_at = time.monotonic()
+
+        self.is_running = True
+
+        while self.is_running:
+            self.frame_pacer.wait()
+
+            frame = self.grab_frame(region=self.capture_region)
+            timestamp = time.time()
+
+            self.sequence_number += 1
+
+            for name, capture_frame in self.capture_plan.apply(frame, self.capture_region).items():
+                self.frame_transports[name].write(capture_frame, self.sequence_number, timestamp)
+
+            if self.report_interval and (time.monotonic() - last_reported_at) >= self.report_interval:
+                self.report()
+                last_reported_at = time.monotonic()
+
+    def stop(self):
+        self.is_running = False
+
+    def report(self):
+        statistics = self.frame_pacer.statistics
+        print(f"Frame Grabber: {statistics['achieved_frame_rate']} FPS (Target: {statistics['target_frame_rate'] or 'Unlimited'}) - Dropped Ticks: {statistics['dropped_ticks']}")
+
+    def grab_frame(self, region=None):
+        y0, x0, y1, x1 = region or (0, 0, self.height, self.width)
+        width, height = x1 - x0, y1 - y0
 
-    def grab_frame(self):
         window = Gdk.get_default_root_window()
 
-        frame_buffer = Gdk.pixbuf_get_from_window(window, self.x_offset, self.y_offset, self.width, self.height)
-        frame_buffer_data = frame_buffer.get_pixels()
+        frame_buffer = Gdk.pixbuf_get_from_window(window, self.x_offset + x0, self.y_offset + y0, width, height)
+
+        return frame_from_pixel_buffer(
+            frame_buffer.get_pixels(),
+            width,
+            height,
+            frame_buffer.props.rowstride,
+            frame_buffer.props.has_alpha
+        )
 
-        stride = frame_buffer.props.rowstride
-        mode = "RGB"
 
-        if frame_buffer.props.has_alpha:
-            mode = "RGBA"
+def frame_from_pixel_buffer(pixel_data, width, height, rowstride, has_alpha=False):
+    # Strided read-only view over the pixbuf rows; the rowstride padding and alpha channel are skipped without copying
+    channels = 4 if has_alpha else 3
+    pixels = np.frombuffer(pixel_data, dtype="uint8")
 
-        pil_frame = Image.frombytes(mode, (self.width, self.height), frame_buffer_data, "raw", mode, stride)
-        frame = np.array(pil_frame)
+    frame = np.lib.stride_tricks.as_strided(pixels, shape=(height, width, channels), strides=(rowstride, channels, 1), writeable=False)
 
-        return frame
+    return frame[..., :3]
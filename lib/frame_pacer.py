@@ -0,0 +1,56 @@
+import time
+import collections
+
+
+class FramePacer:
+
+    def __init__(self, frame_rate=None, window_size=120):
+        self.frame_rate = frame_rate or None
+        self.frame_interval = (1 / self.frame_rate) if self.frame_rate else 0
+
+        self.next_tick = None
+
+        self.ticks = 0
+        self.dropped_ticks = 0
+
+        self.tick_times = collections.deque(maxlen=window_size)
+
+    @property
+    def achieved_frame_rate(self):
+        if len(self.tick_times) < 2:
+            return 0.0
+
+        elapsed = self.tick_times[-1] - self.tick_times[0]
+        return ((len(self.tick_times) - 1) / elapsed) if elapsed > 0 else 0.0
+
+    @property
+    def statistics(self):
+        return {
+            "target_frame_rate": self.frame_rate,
+            "achieved_frame_rate": round(self.achieved_frame_rate, 2),
+            "ticks": self.ticks,
+            "dropped_ticks": self.dropped_ticks
+        }
+
+    def wait(self):
+        now = time.monotonic()
+
+        if self.frame_interval:
+            if self.next_tick is None:
+                self.next_tick = now
+
+            if now < self.next_tick:
+                time.sleep(self.next_tick - now)
+                now = time.monotonic()
+            else:
+                # Capture ran longer than the frame interval: skip the missed ticks instead of bursting to catch up
+                missed_ticks = int((now - self.next_tick) // self.frame_interval)
+
+                if missed_ticks > 0:
+                    self.dropped_ticks += missed_ticks
+                    self.next_tick += missed_ticks * self.frame_interval
+
+            self.next_tick += self.frame_interval
+
+        self.ticks += 1
+        self.tick_times.append(now)
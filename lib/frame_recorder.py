@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import queue
+import threading
+
+import numpy as np
+
+
+class FrameRecorder:
+    """Hands frames to a background thread that appends them to fixed-size compressed npz chunks with a JSON index"""
+
+    def __init__(self, path, chunk_size=100, queue_size=256, compress=True):
+        self.path = path
+
+        self.chunk_size = chunk_size
+        self.compress = compress
+
+        os.makedirs(self.path, exist_ok=True)
+
+        self.queue = queue.Queue(maxsize=queue_size)
+
+        self.chunks = list()
+
+        self.frames_recorded = 0
+        self.frames_written = 0
+        self.frames_dropped = 0
+
+        self.is_recording = True
+
+        self.writer_thread = threading.Thread(target=self._write_chunks, daemon=True)
+        self.writer_thread.start()
+
+    @property
+    def statistics(self):
+        return {
+            "frames_recorded": self.frames_recorded,
+            "frames_written": self.frames_written,
+            "frames_dropped": self.frames_dropped,
+            "queued_frames": self.queue.qsize(),
+            "chunks": len(self.chunks)
+        }
+
+    def record(self, frame, sequence_number=None, timestamp=None):
+        if not self.is_recording:
+            return False
+
+        if sequence_number is None:
+            sequence_number = self.frames_recorded + self.frames_dropped + 1
+
+        try:
+            # Copied because live frames can be views into a ring buffer that the frame grabber will overwrite
+            self.queue.put_nowait((np.array(frame, dtype="uint8"), sequence_number, timestamp or time.time()))
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+
+        self.frames_recorded += 1
+
+        return True
+
+    def stop(self):
+        if not self.is_recording:
+            return None
+
+        self.is_recording = False
+
+        self.queue.put(None)
+        self.writer_thread.join()
+
+    def _write_chunks(self):
+        frames = list()
+        sequence_numbers = list()
+        timestamps = list()
+
+        while True:
+            item = self.queue.get()
+
+            if item is not None:
+                frames.append(item[0])
+                sequence_numbers.append(item[1])
+                timestamps.append(item[2])
+
+            if len(frames) and (item is None or len(frames) >= self.chunk_size):
+                self._write_chunk(frames, sequence_numbers, timestamps)
+
+                frames = list()
+                sequence_numbers = list()
+                timestamps = list()
+
+            if item is None:
+                break
+
+    def _write_chunk(self, frames, sequence_numbers, timestamps):
+        file_name = f"chunk_{len(self.chunks):06d}.npz"
+        save = np.savez_compressed if self.compress else np.savez
+
+        save(
+            f"{self.path}/{file_name}",
+            frames=np.stack(frames),
+            sequence_numbers=np.array(sequence_numbers, dtype="uint64"),
+            timestamps=np.array(timestamps, dtype="float64")
+        )
+
+        self.chunks.append({
+            "file_name": file_name,
+            "frame_count": len(frames),
+            "first_sequence_number": int(sequence_numbers[0]),
+            "last_sequence_number": int(sequence_numbers[-1]),
+            "first_timestamp": timestamps[0],
+            "last_timestamp": timestamps[-1]
+        })
+
+        self.frames_written += len(frames)
+
+        self._write_index()
+
+    def _write_index(self):
+        with open(f"{self.path}/index.json", "w") as f:
+            f.write(json.dumps({
+                "chunk_size": self.chunk_size,
+                "frames_written": self.frames_written,
+                "frames_dropped": self.frames_dropped,
+                "chunks": self.chunks
+            }))
@@ -0,0 +1,34 @@
+
+class FrameSourceError(BaseException):
+    pass
+
+
+class FrameSource:
+
+    def __init__(self, **kwargs):
+        pass
+
+    @property
+    def window_geometry(self):
+        raise NotImplementedError()
+
+    @property
+    def is_exhausted(self):
+        return False
+
+    def latest_sequence_number(self, capture=None):
+        raise NotImplementedError()
+
+    def read(self, capture=None):
+        raise NotImplementedError()
+
+    def poll_intervals(self, capture=None):
+        """Initial and maximum seconds between polls for a new frame"""
+        return 0.0005, 0.0005
+
+    def supports_waiting(self, capture=None):
+        return False
+
+    def wait(self, sequence_number, timeout=None, capture=None):
+        """Blocks until a frame other than `sequence_number` is available; only for sources that support waiting"""
+        raise NotImplementedError()
@@ -0,0 +1,137 @@
+from lib.frame_source import FrameSource, FrameSourceError
+
+from lib.game_frame import GameFrame
+from lib.capture_plan import CapturePlan
+
+import os
+import glob
+import time
+
+import numpy as np
+
+import skimage.io
+import skvideo.io
+
+
+class RecordedFrameSource(FrameSource):
+    """Replays a directory of PNG frames or a video file, either at a fixed frame rate or as fast as frames are consumed"""
+
+    def __init__(self, path, frame_rate=0, loop=False, **kwargs):
+        super().__init__(**kwargs)
+
+        self.path = path
+
+        self.frame_rate = frame_rate or 0
+        self.loop = loop
+
+        if os.path.isdir(path):
+            self.frame_paths = sorted(glob.glob(f"{path}/*.png"))
+
+            if not len(self.frame_paths):
+                raise FrameSourceError(f"No PNG frames were found in '{path}'...")
+        elif os.path.isfile(path):
+            self.frame_paths = None
+        else:
+            raise FrameSourceError(f"No frames or video file found at '{path}'...")
+
+        self.video_reader = None
+        self.video_frame_index = 0
+        self.video_cycle_offset = 0
+
+        self.sequence_number = 0
+
+        self.current_frame = None
+        self.current_frame_index = None
+
+        self.started_at = None
+        self.video_exhausted = False
+
+        self._read_frame(0)
+
+    @property
+    def frame_count(self):
+        return len(self.frame_paths) if self.frame_paths is not None else None
+
+    @property
+    def window_geometry(self):
+        return {
+            "width": self.current_frame.shape[1],
+            "height": self.current_frame.shape[0],
+            "x_offset": 0,
+            "y_offset": 0
+        }
+
+    @property
+    def is_exhausted(self):
+        if self.loop:
+            return False
+
+        if self.frame_paths is not None:
+            return self.sequence_number >= self.frame_count
+
+        return self.video_exhausted
+
+    def latest_sequence_number(self, capture=None):
+        if capture is not None and capture != CapturePlan.FULL_FRAME:
+            return 0
+
+        if self.frame_rate:
+            if self.started_at is None:
+                self.started_at = time.monotonic()
+
+            sequence_number = int((time.monotonic() - self.started_at) * self.frame_rate) + 1
+        else:
+            sequence_number = self.sequence_number + 1
+
+        if not self.loop and self.frame_count is not None:
+            sequence_number = min(sequence_number, self.frame_count)
+
+        return sequence_number
+
+    def read(self, capture=None):
+        if capture is not None and capture != CapturePlan.FULL_FRAME:
+            return None
+
+        sequence_number = self.latest_sequence_number()
+
+        if sequence_number != self.sequence_number:
+            if not self._read_frame(sequence_number - 1):
+                return None
+
+            self.sequence_number = sequence_number
+
+        return GameFrame(self.current_frame, sequence_number=self.sequence_number)
+
+    def _read_frame(self, index):
+        if index == self.current_frame_index:
+            return True
+
+        if self.frame_paths is not None:
+            self.current_frame = self._rgb(skimage.io.imread(self.frame_paths[index % self.frame_count]))
+            self.current_frame_index = index
+
+            return True
+
+        if self.video_reader is None:
+            self.video_reader = skvideo.io.vreader(self.path)
+
+        # Video frames are decoded sequentially; frames skipped at a fixed frame rate are decoded and dropped
+        while self.video_cycle_offset + self.video_frame_index <= index:
+            try:
+                self.current_frame = self._rgb(next(self.video_reader))
+                self.video_frame_index += 1
+            except StopIteration:
+                if not self.loop or self.video_frame_index == 0:
+                    self.video_exhausted = True
+                    return False
+
+                self.video_reader = skvideo.io.vreader(self.path)
+                self.video_cycle_offset += self.video_frame_index
+                self.video_frame_index = 0
+
+        self.current_frame_index = index
+
+        return True
+
+    def _rgb(self, frame):
+        return np.ascontiguousarray(frame[..., :3], dtype="uint8")
@@ -0,0 +1,39 @@
+from lib.frame_source import FrameSource
+
+
+class TransportFrameSource(FrameSource):
+
+    def __init__(self, frame_transports, primary_capture, window_geometry=None, **kwargs):
+        super().__init__(**kwargs)
+
+        self.frame_transports = frame_transports
+        self.primary_capture = primary_capture
+
+        self._window_geometry = window_geometry
+
+    @property
+    def window_geometry(self):
+        return self._window_geometry
+
+    def latest_sequence_number(self, capture=None):
+        frame_transport = self.frame_transports.get(capture or self.primary_capture)
+        return frame_transport.latest_sequence_number() if frame_transport is not None else 0
+
+    def read(self, capture=None):
+        frame_transport = self.frame_transports.get(capture or self.primary_capture)
+        return frame_transport.read() if frame_transport is not None else None
+
+    def poll_intervals(self, capture=None):
+        frame_transport = self.frame_transports.get(capture or self.primary_capture)
+
+        if frame_transport is None:
+            return super().poll_intervals(capture=capture)
+
+        return frame_transport.POLL_INTERVAL, frame_transport.MAX_POLL_INTERVAL
+
+    def supports_waiting(self, capture=None):
+        frame_transport = self.frame_transports.get(capture or self.primary_capture)
+        return frame_transport is not None and frame_transport.supports_waiting
+
+    def wait(self, sequence_number, timeout=None, capture=None):
+        return self.frame_transports[capture or self.primary_capture].wait(sequence_number, timeout=timeout)
@@ -0,0 +1,37 @@
+
+class FrameTransportError(BaseException):
+    pass
+
+
+class FrameTransport:
+
+    # Seconds between polls for a new frame, backing off up to MAX_POLL_INTERVAL while none arrives.
+    # Transports where polling is a local memory read keep a fixed, short interval
+    POLL_INTERVAL = 0.0005
+    MAX_POLL_INTERVAL = 0.0005
+
+    def __init__(self, shape, channel=None, **kwargs):
+        self.shape = tuple(shape)
+
+        # Captures other than the full frame are published on their own channel
+        self.channel = channel if channel != "FULL" else None
+
+    def write(self, frame, sequence_number, timestamp):
+        raise NotImplementedError()
+
+    def read(self):
+        raise NotImplementedError()
+
+    def latest_sequence_number(self):
+        raise NotImplementedError()
+
+    @property
+    def supports_waiting(self):
+        return False
+
+    def wait(self, sequence_number, timeout=None):
+        """Blocks until a frame other than `sequence_number` is available; only for transports that support waiting"""
+        raise NotImplementedError()
+
+    def clear(self):
+        raise NotImplementedError()
@@ -0,0 +1,23 @@
+from lib.frame_transport import FrameTransportError
+
+from lib.frame_transports.redis_frame_transport import RedisFrameTransport
+from lib.frame_transports.shared_memory_frame_transport import SharedMemoryFrameTransport
+
+from lib.config import config
+
+frame_transports = {
+    "redis": RedisFrameTransport,
+    "shared_memory": SharedMemoryFrameTransport
+}
+
+
+def frame_transports_for_capture_plan(capture_plan, width, height):
+    transport = config["frame_grabber"].get("transport") or "redis"
+
+    if transport not in frame_transports:
+        raise FrameTransportError(f"Invalid frame transport: '{transport}'...")
+
+    return {
+        name: frame_transports[transport](shape, channel=name)
+        for name, shape in capture_plan.shapes(width, height).items()
+    }
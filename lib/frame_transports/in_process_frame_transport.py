@@ -0,0 +1,42 @@
+from lib.frame_transport import FrameTransport
+
+import threading
+
+from lib.game_frame import GameFrame
+
+
+class InProcessFrameTransport(FrameTransport):
+    """Latest-frame slot shared by a capture thread and the game in the same process"""
+
+    def __init__(self, shape, channel=None, **kwargs):
+        super().__init__(shape, channel=channel, **kwargs)
+
+        self.latest_game_frame = None
+        self.condition = threading.Condition()
+
+    def write(self, frame, sequence_number, timestamp):
+        game_frame = GameFrame(frame, sequence_number=sequence_number, timestamp=timestamp)
+
+        # Publishing is a single reference assignment, atomic under the GIL, so readers never take the lock;
+        # it is only held to wake up a consumer blocked in wait()
+        with self.condition:
+            self.latest_game_frame = game_frame
+            self.condition.notify_all()
+
+    def read(self):
+        return self.latest_game_frame
+
+    def latest_sequence_number(self):
+        game_frame = self.latest_game_frame
+        return game_frame.sequence_number if game_frame is not None else 0
+
+    @property
+    def supports_waiting(self):
+        return True
+
+    def wait(self, sequence_number, timeout=None):
+        with self.condition:
+            return self.condition.wait_for(lambda: self.latest_sequence_number() not in (0, sequence_number), timeout=timeout)
+
+    def clear(self):
+        self.latest_game_frame = None
@@ -0,0 +1,52 @@
+from lib.frame_transport import FrameTransport
+
+from lib.game_frame import GameFrame
+
+import numpy as np
+
+from redis import StrictRedis
+
+from lib.config import config
+
+
+class RedisFrameTransport(FrameTransport):
+
+    # Every poll is a round trip to the Redis server
+    POLL_INTERVAL = 0.001
+    MAX_POLL_INTERVAL = 0.008
+
+    def __init__(self, shape, channel=None, **kwargs):
+        super().__init__(shape, channel=channel, **kwargs)
+
+        self.redis_client = StrictRedis(**config["redis"])
+        self.redis_key = config["frame_grabber"]["redis_key"]
+
+        if self.channel is not None:
+            self.redis_key = f"{self.redis_key}:{self.channel}"
+
+    def write(self, frame, sequence_number, timestamp):
+        # A single hash keeps the frame and its metadata consistent for readers
+        self.redis_client.hmset(self.redis_key, {
+            "frame": frame.tobytes(),
+            "sequence_number": sequence_number,
+            "timestamp": repr(timestamp)
+        })
+
+    def read(self):
+        frame_bytes, sequence_number, timestamp = self.redis_client.hmget(self.redis_key, "frame", "sequence_number", "timestamp")
+
+        if frame_bytes is None:
+            return None
+
+        return GameFrame(
+            np.frombuffer(frame_bytes, dtype="uint8").reshape(self.shape),
+            sequence_number=int(sequence_number),
+            timestamp=float(timestamp)
+        )
+
+    def latest_sequence_number(self):
+        sequence_number = self.redis_client.hget(self.redis_key, "sequence_number")
+        return int(sequence_number) if sequence_number is not None else 0
+
+    def clear(self):
+        self.redis_client.delete(self.redis_key)
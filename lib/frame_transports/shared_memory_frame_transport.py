@@ -0,0 +1,134 @@
+from lib.frame_transport import FrameTransport, FrameTransportError
+
+from lib.game_frame import GameFrame
+
+import os
+import mmap
+
+import numpy as np
+
+from lib.config import config
+
+
+class SharedMemoryFrameTransport(FrameTransport):
+    # Header: latest sequence number, slot count, frame size (in bytes)
+    HEADER_SIZE = 64
+    # Slot Header: sequence number and capture timestamp of the frame currently held by the slot
+    SLOT_HEADER_SIZE = 16
+
+    def __init__(self, shape, channel=None, **kwargs):
+        super().__init__(shape, channel=channel, **kwargs)
+
+        shared_memory_config = config["frame_grabber"].get("shared_memory") or dict()
+
+        self.path = kwargs.get("path") or shared_memory_config.get("path") or "/dev/shm/project_ec_frames"
+
+        if self.channel is not None:
+            self.path = f"{self.path}_{self.channel.lower()}"
+
+        self.slot_count = kwargs.get("slots") or shared_memory_config.get("slots") or 16
+
+        self.frame_size = int(np.prod(self.shape))
+        # Slots are kept 8-byte aligned so the slot headers can be viewed in place
+        self.slot_size = self.SLOT_HEADER_SIZE + (-(-self.frame_size // 8) * 8)
+        self.buffer_size = self.HEADER_SIZE + (self.slot_count * self.slot_size)
+
+        self.buffer = None
+        self.header = None
+        self.slot_headers = list()
+        self.slot_timestamps = list()
+        self.slot_frames = list()
+        self.slot_frame_views = list()
+
+    def write(self, frame, sequence_number, timestamp):
+        if self.buffer is None:
+            self._map(create=True)
+
+        slot = sequence_number % self.slot_count
+
+        # Invalidate the slot while it is being written so readers never see a partial frame
+        self.slot_headers[slot][0] = 0
+        self.slot_frames[slot][...] = frame
+        self.slot_timestamps[slot][0] = timestamp
+        self.slot_headers[slot][0] = sequence_number
+
+        self.header[0] = sequence_number
+
+    def read(self):
+        if self.buffer is None and not self._map(create=False):
+            return None
+
+        sequence_number = int(self.header[0])
+
+        if sequence_number == 0:
+            return None
+
+        slot = sequence_number % self.slot_count
+
+        if self.slot_headers[slot][0] != sequence_number:
+            return None
+
+        slot_header = self.slot_headers[slot]
+
+        # Zero-copy read-only view; it remains valid until the writer wraps around the ring (slot_count - 1 frames later).
+        # The writer zeroes the slot header before overwriting a slot, so re-checking it after use detects torn frames.
+        return GameFrame(
+            self.slot_frame_views[slot],
+            sequence_number=sequence_number,
+            timestamp=float(self.slot_timestamps[slot][0]),
+            validator=lambda: int(slot_header[0]) == sequence_number
+        )
+
+    def latest_sequence_number(self):
+        if self.buffer is None and not self._map(create=False):
+            return 0
+
+        return int(self.header[0])
+
+    def clear(self):
+        self._map(create=True)
+
+    def _map(self, create=False):
+        if create:
+            # Resized in place (never truncated to zero) so that attached readers do not fault
+            with open(self.path, "ab") as f:
+                f.truncate(self.buffer_size)
+        elif not os.path.isfile(self.path) or os.path.getsize(self.path) != self.buffer_size:
+            return False
+
+        with open(self.path, "r+b") as f:
+            self.buffer = mmap.mmap(f.fileno(), self.buffer_size)
+
+        self.header = np.ndarray((3,), dtype="uint64", buffer=self.buffer, offset=0)
+
+        if create:
+            self.header[:] = (0, self.slot_count, self.frame_size)
+        elif int(self.header[1]) == 0:
+            # The writer has not initialized the buffer yet
+            self.header = None
+            self.buffer.close()
+            self.buffer = None
+
+            return False
+        elif int(self.header[1]) != self.slot_count or int(self.header[2]) != self.frame_size:
+            raise FrameTransportError(f"The shared memory frame buffer at '{self.path}' does not match the expected layout...")
+
+        self.slot_headers = list()
+        self.slot_timestamps = list()
+        self.slot_frames = list()
+        self.slot_frame_views = list()
+
+        for slot in range(self.slot_count):
+            offset = self.HEADER_SIZE + (slot * self.slot_size)
+
+            self.slot_headers.append(np.ndarray((1,), dtype="uint64", buffer=self.buffer, offset=offset))
+            self.slot_timestamps.append(np.ndarray((1,), dtype="float64", buffer=self.buffer, offset=offset + 8))
+            self.slot_frames.append(np.ndarray(self.shape, dtype="uint8", buffer=self.buffer, offset=offset + self.SLOT_HEADER_SIZE))
+
+            # Consumers only ever get read-only views so they cannot corrupt the ring
+            slot_frame_view = self.slot_frames[-1].view()
+            slot_frame_view.flags.writeable = False
+
+            self.slot_frame_views.append(slot_frame_view)
+
+        return True
@@ -8,10 +8,8 @@ import signal
 import shlex
 import time
 import uuid
-import re
 import atexit
-
-import numpy as np
+import threading
 
 import lib.ocr
 
@@ -20,8 +18,16 @@ import skimage.io
 from lib.game_launchers.steam_game_launcher import SteamGameLauncher
 
 from lib.input_controller import InputController
+from lib.window_locator import WindowLocator
+from lib.latency_tracer import LatencyTracer
+
+from lib.capture_plan import CapturePlan
+
+from lib.frame_grabber import FrameGrabber
 
-from redis import StrictRedis
+from lib.frame_transports import frame_transports_for_capture_plan
+from lib.frame_transports.in_process_frame_transport import InProcessFrameTransport
+from lib.frame_sources.transport_frame_source import TransportFrameSource
 
 from lib.config import config
 
@@ -43,9 +49,23 @@ class Game(offshoot.Pluggable):
 
         self.is_launched = False
 
+        self.window_locator = None
+
+        self.launched_at = None
+        self.launch_duration = None
+
         self.frame_grabber_process = None
+        self.frame_grabber_thread = None
+        self.frame_grabber = None
 
-        self.redis_client = StrictRedis(**config["redis"])
+        self.frame_source = None
+
+        self.last_frame_sequence_number = 0
+        self.frames_consumed = 0
+        self.frames_skipped = 0
+        self.frames_invalidated = 0
+
+        self.latency_tracer = LatencyTracer()
 
         self.kwargs = kwargs
 
@@ -66,8 +86,14 @@ class Game(offshoot.Pluggable):
     def screen_regions(self):
         raise NotImplementedError()
 
+    @property
+    def capture_plan(self):
+        return CapturePlan(self.kwargs.get("capture_plan"))
+
     @offshoot.forbidden
     def launch(self):
+        self.launched_at = time.time()
+
         self.before_launch()
         self.game_launcher().launch(**self.kwargs)
         self.after_launch()
@@ -78,17 +104,22 @@ class Game(offshoot.Pluggable):
     def after_launch(self):
         self.is_launched = True
 
-        time.sleep(5)
+        self.window_locator = WindowLocator()
 
-        self.window_id = subprocess.check_output(shlex.split(f"xdotool search --name \"{self.window_name}\"")).decode("utf-8").strip()
+        # Polls for the game window with backoff instead of waiting a fixed amount of time
+        self.window_id = self.window_locator.locate(self.window_name, timeout=self.kwargs.get("window_timeout") or 60)
 
-        subprocess.call(shlex.split(f"xdotool windowmove {self.window_id} 0 0"))
-        subprocess.call(shlex.split(f"xdotool windowactivate {self.window_id}"))
+        self.window_locator.move(self.window_id, 0, 0)
+        self.window_locator.activate(self.window_id)
 
         self.window_geometry = self.extract_window_geometry()
 
-    def play(self, game_agent_class_name=None):
-        if not self.is_launched:
+        self.launch_duration = time.time() - self.launched_at
+        print(f"Game '{self.__class__.__name__}' was ready {self.launch_duration:.2f} seconds after launch")
+
+    def play(self, game_agent_class_name=None, frame_source=None, input_controller=None):
+        # A provided frame source (e.g. recorded frames) drives the agent headlessly, without a launched game
+        if frame_source is None and not self.is_launched:
             raise GameError(f"Game '{self.__class__.__name__}' is not running...")
 
         game_agent_class = offshoot.discover("GameAgent").get(game_agent_class_name)
@@ -96,40 +127,52 @@ class Game(offshoot.Pluggable):
         if game_agent_class is None:
             raise GameError("The provided Game Agent class name does not map to an existing class...")
 
+        if frame_source is not None:
+            self.frame_source = frame_source
+            self.window_geometry = frame_source.window_geometry
+
+        if input_controller is None:
+            input_controller_config = config.get("input_controller") or dict()
+
+            input_controller = InputController(
+                game_window_id=self.window_id,
+                asynchronous=input_controller_config.get("asynchronous", False),
+                focus_ttl=input_controller_config.get("focus_ttl", 0.1)
+            )
+
+        input_controller.latency_tracer = self.latency_tracer
+
         game_agent = game_agent_class(
             game=self,
-            input_controller=InputController(game_window_id=self.window_id)
+            input_controller=input_controller
         )
 
-        self.start_frame_grabber()
-        time.sleep(1)
+        if frame_source is None:
+            self.start_frame_grabber()
+            time.sleep(1)
 
-        subprocess.call(shlex.split(f"xdotool windowactivate {self.window_id}"))
+            self.window_locator.activate(self.window_id)
+
+        while not self.frame_source.is_exhausted:
+            game_frame = self.wait_for_next_frame(timeout=1)
+
+            if game_frame is None:
+                continue
 
-        while True:
-            frame = self.grab_latest_frame()
             try:
-                game_agent.on_frame(frame)
+                game_agent.on_frame(game_frame.frame, game_frame=game_frame)
             except Exception as e:
                 raise e
                 time.sleep(0.1)
 
+            # The frame grabber overwrote the frame while it was being handled; more shared memory slots are needed
+            if not game_frame.is_valid():
+                self.frames_invalidated += 1
+
     @offshoot.forbidden
     def extract_window_geometry(self):
         if self.is_launched:
-            geometry = dict()
-
-            window_geometry = subprocess.check_output(shlex.split(f"xdotool getwindowgeometry {self.window_id}")).decode("utf-8").strip()
-            size = re.match(r"\s+Geometry: ([0-9]+x[0-9]+)", window_geometry.split("\n")[2]).group(1).split("x")
-
-            geometry["width"] = int(size[0])
-            geometry["height"] = int(size[1])
-
-            window_information = subprocess.check_output(shlex.split(f"xwininfo -id {self.window_id}")).decode("utf-8").strip()
-            geometry["x_offset"] = int(re.match(r"\s+Absolute upper-left X:\s+([0-9]+)", window_information.split("\n")[2]).group(1))
-            geometry["y_offset"] = int(re.match(r"\s+Absolute upper-left Y:\s+([0-9]+)", window_information.split("\n")[3]).group(1))
-
-            return geometry
+            return self.window_locator.geometry(self.window_id)
         return None
 
     @offshoot.forbidden
@@ -137,19 +180,25 @@ class Game(offshoot.Pluggable):
         if not self.is_launched:
             raise GameError(f"Game '{self.__class__.__name__}' is not running...")
 
-        if self.frame_grabber_process is not None:
+        if self.frame_grabber_process is not None or self.frame_grabber_thread is not None:
             self.stop_frame_grabber()
 
-        frame_grabber_command = f"invoke start_frame_grabber -w {self.window_geometry['width']} -h {self.window_geometry['height']} -x {self.window_geometry['x_offset']} -y {self.window_geometry['y_offset']}"
-        self.frame_grabber_process = subprocess.Popen(shlex.split(frame_grabber_command))
+        capture_plan = self.capture_plan
 
-        signal.signal(signal.SIGINT, self._handle_signal)
-        signal.signal(signal.SIGTERM, self._handle_signal)
-
-        atexit.register(self._handle_signal, 15, None, False)
+        if config["frame_grabber"].get("mode") == "thread":
+            self._start_frame_grabber_thread(capture_plan)
+        else:
+            self._start_frame_grabber_process(capture_plan)
 
     @offshoot.forbidden
     def stop_frame_grabber(self):
+        if self.frame_grabber_thread is not None:
+            self.frame_grabber.stop()
+            self.frame_grabber_thread.join()
+
+            self.frame_grabber_thread = None
+            self.frame_grabber = None
+
         if self.frame_grabber_process is None:
             return None
 
@@ -158,15 +207,108 @@ class Game(offshoot.Pluggable):
 
         atexit.unregister(self._handle_signal)
 
+    def _start_frame_grabber_process(self, capture_plan):
+        self.frame_source = TransportFrameSource(
+            frame_transports_for_capture_plan(capture_plan, self.window_geometry["width"], self.window_geometry["height"]),
+            capture_plan.primary_capture,
+            window_geometry=self.window_geometry
+        )
+
+        frame_grabber_command = f"invoke start_frame_grabber -w {self.window_geometry['width']} -h {self.window_geometry['height']} -x {self.window_geometry['x_offset']} -y {self.window_geometry['y_offset']} --frame-rate {self.kwargs.get('frame_rate') or 0} --capture-plan {shlex.quote(capture_plan.to_json())}"
+        self.frame_grabber_process = subprocess.Popen(shlex.split(frame_grabber_command))
+
+        signal.signal(signal.SIGINT, self._handle_signal)
+        signal.signal(signal.SIGTERM, self._handle_signal)
+
+        atexit.register(self._handle_signal, 15, None, False)
+
+    def _start_frame_grabber_thread(self, capture_plan):
+        # Captures in this process and hands frames over through latest-frame slots: no extra interpreter, no IPC
+        frame_transports = {
+            name: InProcessFrameTransport(shape, channel=name)
+            for name, shape in capture_plan.shapes(self.window_geometry["width"], self.window_geometry["height"]).items()
+        }
+
+        self.frame_grabber = FrameGrabber(
+            width=self.window_geometry["width"],
+            height=self.window_geometry["height"],
+            x_offset=self.window_geometry["x_offset"],
+            y_offset=self.window_geometry["y_offset"],
+            frame_rate=self.kwargs.get("frame_rate"),
+            capture_plan=capture_plan,
+            frame_transports=frame_transports
+        )
+
+        self.frame_grabber_thread = threading.Thread(target=self.frame_grabber.start, daemon=True)
+        self.frame_grabber_thread.start()
+
+        self.frame_source = TransportFrameSource(
+            frame_transports,
+            capture_plan.primary_capture,
+            window_geometry=self.window_geometry
+        )
+
     @offshoot.forbidden
-    def grab_latest_frame(self):
-        frame_bytes = self.redis_client.get(config["frame_grabber"]["redis_key"])
-
-        return np.fromstring(frame_bytes, dtype="uint8").reshape((
-            self.window_geometry.get("height"),
-            self.window_geometry.get("width"),
-            3
-        ))
+    def grab_latest_frame(self, capture=None):
+        game_frame = self.grab_latest_game_frame(capture=capture)
+        return game_frame.frame if game_frame is not None else None
+
+    @offshoot.forbidden
+    def grab_latest_game_frame(self, capture=None):
+        if self.frame_source is None:
+            return None
+
+        return self.frame_source.read(capture=capture)
+
+    @offshoot.forbidden
+    def wait_for_next_frame(self, timeout=None):
+        started_at = time.monotonic()
+        poll_interval, max_poll_interval = self.frame_source.poll_intervals() if self.frame_source is not None else (0.001, 0.001)
+
+        while True:
+            if self.frame_source is not None:
+                sequence_number = self.frame_source.latest_sequence_number()
+
+                # Anything other than the last consumed frame is new (the sequence restarts with the frame grabber)
+                if sequence_number > 0 and sequence_number != self.last_frame_sequence_number:
+                    game_frame = self.frame_source.read()
+
+                    if game_frame is not None:
+                        self._consume_game_frame(game_frame)
+                        return game_frame
+
+            remaining = (timeout - (time.monotonic() - started_at)) if timeout is not None else None
+
+            if remaining is not None and remaining <= 0:
+                return None
+
+            if self.frame_source is not None and self.frame_source.supports_waiting():
+                # Blocks until the frame grabber publishes instead of polling
+                self.frame_source.wait(self.last_frame_sequence_number, timeout=remaining)
+                continue
+
+            # Polling backs off while no new frame shows up, only as far as the frame source allows (e.g. Redis round trips)
+            time.sleep(min(poll_interval, remaining) if remaining is not None else poll_interval)
+            poll_interval = min(poll_interval * 2, max_poll_interval)
+
+    @property
+    @offshoot.forbidden
+    def frame_statistics(self):
+        return {
+            "last_frame_sequence_number": self.last_frame_sequence_number,
+            "frames_consumed": self.frames_consumed,
+            "frames_skipped": self.frames_skipped,
+            "frames_invalidated": self.frames_invalidated
+        }
+
+    def _consume_game_frame(self, game_frame):
+        if self.last_frame_sequence_number < game_frame.sequence_number and self.frames_consumed > 0:
+            self.frames_skipped += game_frame.sequence_number - self.last_frame_sequence_number - 1
+
+        self.last_frame_sequence_number = game_frame.sequence_number
+        self.frames_consumed += 1
+
+        self.latency_tracer.record_frame(game_frame)
 
     def _handle_signal(self, signum=15, frame=None, do_exit=True):
         if self.frame_grabber_process is not None:
@@ -2,9 +2,14 @@ import offshoot
 
 from lib.config import config
 
+from lib.frame_recorder import FrameRecorder
+
+import lib.profiling
+
 import time
 import uuid
 import pickle
+import atexit
 
 import skimage.io
 
@@ -24,16 +29,31 @@ class GameAgent(offshoot.Pluggable):
         self.input_controller = kwargs["input_controller"]
         self.machine_learning_models = dict()
 
+        self.game_frame = None
+        self.frame_recorder = None
+
         self.frame_handlers = dict(
             NOOP=self.handle_noop,
-            COLLECT_FRAMES=self.handle_collect_frames
+            COLLECT_FRAMES=self.handle_collect_frames,
+            RECORD_FRAMES=self.handle_record_frames
         )
 
     @offshoot.forbidden
-    def on_frame(self, frame):
-        frame_handler = self.frame_handlers.get(self.config.get("frame_handler", "NOOP"))
+    def on_frame(self, frame, game_frame=None):
+        self.game_frame = game_frame
+
+        # Key events sent while handling this frame are traced back to its capture
+        self.input_controller.trigger_game_frame = game_frame
 
-        frame_handler(frame)
+        frame_handler_name = self.config.get("frame_handler", "NOOP")
+        frame_handler = self.frame_handlers.get(frame_handler_name)
+
+        # Recording is a side channel: frames are queued before (and regardless of) the configured handler
+        if self.config.get("record_frames") and frame_handler_name != "RECORD_FRAMES":
+            self.record_frame(frame)
+
+        with lib.profiling.profiler.frame(name=f"frame_handler.{frame_handler_name}"):
+            frame_handler(frame)
 
     @offshoot.forbidden
     def load_machine_learning_model(self, file_path):
@@ -49,3 +69,21 @@ class GameAgent(offshoot.Pluggable):
         skimage.io.imsave(f"datasets/collect_frames/frame_{str(uuid.uuid4())}.png", frame)
         time.sleep(self.config.get("collect_frames_interval") or 1)
 
+    def handle_record_frames(self, frame):
+        self.record_frame(frame)
+
+    @offshoot.forbidden
+    def record_frame(self, frame):
+        if self.frame_recorder is None:
+            self.frame_recorder = FrameRecorder(
+                self.config.get("record_frames_path") or f"datasets/record_frames/session_{str(uuid.uuid4())}",
+                chunk_size=self.config.get("record_frames_chunk_size") or 100,
+                queue_size=self.config.get("record_frames_queue_size") or 256
+            )
+
+            atexit.register(self.frame_recorder.stop)
+
+        if self.game_frame is not None:
+            self.frame_recorder.record(frame, self.game_frame.sequence_number, self.game_frame.timestamp)
+        else:
+            self.frame_recorder.record(frame)
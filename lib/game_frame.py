@@ -0,0 +1,20 @@
+import time
+
+
+class GameFrame:
+
+    def __init__(self, frame, sequence_number=0, timestamp=None, validator=None):
+        self.frame = frame
+
+        self.sequence_number = sequence_number
+        self.timestamp = timestamp or time.time()
+
+        # Zero-copy transports provide a check that the memory behind the frame has not been reused since it was read
+        self.validator = validator
+
+    @property
+    def age(self):
+        return time.time() - self.timestamp
+
+    def is_valid(self):
+        return self.validator() if self.validator is not None else True
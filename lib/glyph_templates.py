@@ -0,0 +1,118 @@
+import os
+
+import numpy as np
+
+import skimage.io
+
+from redis import StrictRedis
+
+from lib.config import config
+
+import lib.ocr_dataset
+
+
+class GlyphTemplateClassifier:
+    """Recognizes normalized OCR tokens by correlating them against a bank of glyph templates
+
+    Duck-types the scikit-learn predict() interface so it can be passed anywhere lib.ocr expects an ocr_classifier.
+    """
+
+    def __init__(self, templates, labels, min_score=0.5):
+        templates = np.asarray(templates, dtype=np.float32)
+
+        self.templates = templates.reshape(len(templates), -1)
+        self.labels = np.array(labels, dtype=object)
+
+        self.min_score = min_score
+
+        self.normalized_templates = self._normalize(self.templates)
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+
+        if not len(X):
+            return np.array([], dtype=object)
+
+        scores = self.scores(X)
+        best = np.argmax(scores, axis=1)
+
+        predictions = self.labels[best]
+        predictions[scores[np.arange(len(X)), best] < self.min_score] = ""
+
+        return predictions
+
+    def scores(self, X):
+        # Normalized cross-correlation of every token with every template in one matrix product
+        X = np.asarray(X, dtype=np.float32).reshape(len(X), -1)
+        return self._normalize(X) @ self.normalized_templates.T
+
+    def save(self, file_path):
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        np.savez_compressed(file_path, templates=self.templates, labels=self.labels.astype(str), min_score=self.min_score)
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path) as data:
+            return cls(data["templates"], data["labels"].tolist(), min_score=float(data["min_score"]))
+
+    @classmethod
+    def from_tokens(cls, tokens, labels, min_score=0.5):
+        """Averages the tokens of each label into a single template"""
+        tokens = np.asarray(tokens, dtype=np.float32).reshape(len(tokens), -1)
+        labels = np.asarray(labels, dtype=object)
+
+        unique_labels = sorted({label for label in labels if label})
+
+        if not len(unique_labels):
+            raise ValueError("No labeled tokens to build glyph templates from...")
+
+        templates = np.array([tokens[labels == label].mean(axis=0) for label in unique_labels], dtype=np.float32)
+
+        return cls(templates, unique_labels, min_score=min_score)
+
+    @classmethod
+    def from_dataset(cls, path="datasets/ocr/characters", ocr_classifier=None, min_score=0.5):
+        """Builds the bank from annotated character tokens (a PNG directory or a build_ocr_dataset .npy file); labels come from Redis or, failing that, ocr_classifier"""
+        tokens, labels = load_labeled_tokens(path, ocr_classifier=ocr_classifier)
+
+        return cls.from_tokens(tokens, labels, min_score=min_score)
+
+    @staticmethod
+    def _normalize(X):
+        X = X - X.mean(axis=1, keepdims=True)
+        norms = np.linalg.norm(X, axis=1, keepdims=True)
+
+        return X / np.maximum(norms, 1e-6)
+
+
+def load_labeled_tokens(path="datasets/ocr/characters", ocr_classifier=None):
+    if path.endswith(".npy"):
+        dataset, _ = lib.ocr_dataset.load_ocr_dataset(path)
+
+        tokens = np.array(dataset["token"], dtype=np.float32).reshape(len(dataset), -1)
+        character_uuids = [character_uuid.decode("utf-8").upper() for character_uuid in dataset["uuid"]]
+    else:
+        file_names = sorted(file_name for file_name in os.listdir(path) if file_name.startswith("char_") and file_name.endswith(".png"))
+
+        tokens = list()
+
+        for file_name in file_names:
+            token = skimage.io.imread(f"{path}/{file_name}")
+
+            if token.ndim == 3:
+                token = token[..., 0]
+
+            tokens.append((token > 0).flatten())
+
+        tokens = np.array(tokens, dtype=np.float32).reshape(len(tokens), -1)
+        character_uuids = [file_name.split("_")[1].upper() for file_name in file_names]
+
+    if ocr_classifier is None:
+        redis_client = StrictRedis(**config["redis"])
+
+        redis_labels = redis_client.mget([f"PROJECT_EC:CHAR:{character_uuid}" for character_uuid in character_uuids]) if character_uuids else list()
+        labels = [label.decode("utf-8") if label is not None else "" for label in redis_labels]
+    else:
+        labels = list(ocr_classifier.predict(tokens)) if len(tokens) else list()
+
+    return tokens, labels
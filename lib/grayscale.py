@@ -0,0 +1,26 @@
+import numpy as np
+
+
+# ITU-R 709 luma weights of skimage.color.rgb2gray scaled to 16 bits; they sum to 65536 so grays map to themselves
+GRAYSCALE_WEIGHTS = (13927, 46884, 4725)
+
+
+def grayscale(frame, out=None, luma_buffer=None, channel_buffer=None):
+    """Integer rgb2gray of an RGB(A) uint8 frame; the optional buffers let callers reuse memory across frames"""
+    shape = frame.shape[:2]
+
+    luma_buffer = luma_buffer if luma_buffer is not None else np.empty(shape, dtype="uint32")
+    channel_buffer = channel_buffer if channel_buffer is not None else np.empty(shape, dtype="uint32")
+
+    np.multiply(frame[..., 0], GRAYSCALE_WEIGHTS[0], out=luma_buffer, dtype="uint32")
+
+    for channel in [1, 2]:
+        np.multiply(frame[..., channel], GRAYSCALE_WEIGHTS[channel], out=channel_buffer, dtype="uint32")
+        np.add(luma_buffer, channel_buffer, out=luma_buffer)
+
+    np.right_shift(luma_buffer, 16, out=luma_buffer)
+
+    out = out if out is not None else np.empty(shape, dtype="uint8")
+    np.copyto(out, luma_buffer, casting="unsafe")
+
+    return out
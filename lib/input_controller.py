@@ -1,35 +1,139 @@
 from pymouse import PyMouse
 from pykeyboard import PyKeyboard
 
-import time
+from lib.window_focus_tracker import WindowFocusTracker
 
-import subprocess
-import shlex
+import time
+import threading
+import collections
 
 
 class InputController:
 
-    def __init__(self, game_window_id=None):
+    def __init__(self, game_window_id=None, asynchronous=False, focus_ttl=0.1):
         self.game_window_id = game_window_id
+        self.window_focus_tracker = WindowFocusTracker(window_id=game_window_id, ttl=focus_ttl)
+
+        self.keyboard, self.mouse = self._create_input_devices()
+
+        self.asynchronous = asynchronous
 
-        self.keyboard = PyKeyboard()
-        self.mouse = PyMouse()
+        self.latency_tracer = None
+        self.trigger_game_frame = None
+
+        # Asynchronous mode: held keys are released by a worker thread at their scheduled time
+        self.key_holds = dict()
+        self.key_hold_log = collections.deque(maxlen=1000)
+
+        self.condition = threading.Condition(threading.RLock())
+        self.release_thread = None
+
+        if self.asynchronous:
+            self.release_thread = threading.Thread(target=self._release_scheduled_keys, daemon=True)
+            self.release_thread.start()
 
     @property
     def game_is_focused(self):
-        focused_window_id = subprocess.check_output(shlex.split("xdotool getwindowfocus")).decode("utf-8").strip()
-        return focused_window_id == self.game_window_id
+        return self.window_focus_tracker.is_focused
+
+    @property
+    def key_hold_statistics(self):
+        # Holds ended early by cancel_hold/release_key say nothing about release timing
+        key_holds = [key_hold for key_hold in self.key_hold_log if not key_hold["cancelled"]]
+        cancelled_count = len(self.key_hold_log) - len(key_holds)
+
+        if not len(key_holds):
+            return dict(count=0, cancelled_count=cancelled_count)
+
+        errors = [key_hold["actual"] - key_hold["requested"] for key_hold in key_holds]
+
+        return dict(
+            count=len(key_holds),
+            cancelled_count=cancelled_count,
+            mean_requested_duration=sum(key_hold["requested"] for key_hold in key_holds) / len(key_holds),
+            mean_actual_duration=sum(key_hold["actual"] for key_hold in key_holds) / len(key_holds),
+            mean_error=sum(errors) / len(errors),
+            max_error=max(errors, key=abs)
+        )
 
     def tap_key(self, key, duration=0.05):
+        if self.asynchronous:
+            return self.hold_key(key, duration)
+
         if self.game_is_focused:
             self.keyboard.press_key(key)
+            self._trace_action(key)
+
             time.sleep(duration)
             self.keyboard.release_key(key)
 
+    def hold_key(self, key, duration):
+        """Presses a key and schedules its release; holding an already held key moves its release instead"""
+        with self.condition:
+            now = time.monotonic()
+
+            if key in self.key_holds:
+                self.key_holds[key]["release_at"] = now + duration
+            elif self.game_is_focused:
+                self.keyboard.press_key(key)
+                self.key_holds[key] = {"pressed_at": now, "release_at": now + duration}
+
+                # Only actual key events count as capture-to-keypress samples
+                self._trace_action(key)
+            else:
+                return None
+
+            self.condition.notify()
+
+    def cancel_hold(self, key):
+        with self.condition:
+            if key in self.key_holds:
+                self._release_held_key(key, cancelled=True)
+
     def press_key(self, key):
-        if self.game_is_focused:
-            self.keyboard.press_key(key)
+        # The release worker shares the X connection, so every keyboard call goes through the lock
+        with self.condition:
+            if self.game_is_focused:
+                self.keyboard.press_key(key)
+                self._trace_action(key)
 
     def release_key(self, key):
-        if self.game_is_focused:
-            self.keyboard.release_key(key)
+        with self.condition:
+            if key in self.key_holds:
+                return self._release_held_key(key, cancelled=True)
+
+            if self.game_is_focused:
+                self.keyboard.release_key(key)
+
+    def _trace_action(self, key):
+        if self.latency_tracer is not None and self.trigger_game_frame is not None:
+            self.latency_tracer.record_action(self.trigger_game_frame, key)
+
+    def _create_input_devices(self):
+        return PyKeyboard(), PyMouse()
+
+    def _release_held_key(self, key, cancelled=False):
+        key_hold = self.key_holds.pop(key)
+        self.keyboard.release_key(key)
+
+        released_at = time.monotonic()
+
+        self.key_hold_log.append({
+            "key": key,
+            "requested": key_hold["release_at"] - key_hold["pressed_at"],
+            "actual": released_at - key_hold["pressed_at"],
+            "cancelled": cancelled
+        })
+
+    def _release_scheduled_keys(self):
+        with self.condition:
+            while True:
+                now = time.monotonic()
+
+                for key in [key for key, key_hold in self.key_holds.items() if key_hold["release_at"] <= now]:
+                    self._release_held_key(key)
+
+                if len(self.key_holds):
+                    self.condition.wait(min(key_hold["release_at"] for key_hold in self.key_holds.values()) - now)
+                else:
+                    self.condition.wait()
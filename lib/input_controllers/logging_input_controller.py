@@ -0,0 +1,50 @@
+from lib.input_controller import InputController
+
+import time
+
+
+class LoggingKeyboard:
+    """Stands in for PyKeyboard: any '*_key' attribute resolves to the key name and key events are only logged"""
+
+    def __init__(self, input_controller):
+        self.input_controller = input_controller
+
+    def __getattr__(self, name):
+        if name.endswith("_key"):
+            return name[:-4]
+
+        raise AttributeError(name)
+
+    def press_key(self, key):
+        self.input_controller.log_event("press", key)
+
+    def release_key(self, key):
+        self.input_controller.log_event("release", key)
+
+
+class LoggingInputController(InputController):
+
+    def __init__(self, game_window_id=None, verbose=False):
+        self.verbose = verbose
+        self.events = list()
+
+        super().__init__(game_window_id=game_window_id)
+
+    @property
+    def game_is_focused(self):
+        return True
+
+    def tap_key(self, key, duration=0.05):
+        # Durations are logged rather than slept through so replays run as fast as the agent allows
+        self.log_event("tap", key, duration=duration)
+        self._trace_action(key)
+
+    def _create_input_devices(self):
+        return LoggingKeyboard(self), None
+
+    def log_event(self, action, key, duration=None):
+        event = {"timestamp": time.time(), "action": action, "key": key, "duration": duration}
+        self.events.append(event)
+
+        if self.verbose:
+            print(f"{action.upper()}: {key}" + (f" ({duration:.4f}s)" if duration is not None else ""))
@@ -1,22 +1,118 @@
 from invoke import task
 
 from lib.frame_grabber import FrameGrabber
+from lib.capture_plan import CapturePlan
+from lib.glyph_templates import GlyphTemplateClassifier
+from lib.frame_sources.recorded_frame_source import RecordedFrameSource
+from lib.input_controllers.logging_input_controller import LoggingInputController
 from lib.games import *
 
+import lib.benchmarks
+import lib.ocr_dataset
+
+import glob
+import time
+
+from pprint import pprint
+
 
 @task
-def start_frame_grabber(ctx, width=640, height=480, x_offset=0, y_offset=0):
+def start_frame_grabber(ctx, width=640, height=480, x_offset=0, y_offset=0, frame_rate=0, capture_plan=""):
     frame_grabber = FrameGrabber(
         width=width,
         height=height,
         x_offset=x_offset,
-        y_offset=y_offset
+        y_offset=y_offset,
+        frame_rate=frame_rate,
+        capture_plan=CapturePlan.from_json(capture_plan)
     )
 
     frame_grabber.start()
 
+@task
+def benchmark_frame_conversion(ctx, width=768, height=480, iterations=100):
+    for has_alpha in [False, True]:
+        pprint(lib.benchmarks.benchmark_frame_conversion(width=width, height=height, has_alpha=has_alpha, iterations=iterations))
+
+@task
+def benchmark(ctx, iterations=10, tolerance=0.2, save_baseline=False):
+    results = lib.benchmarks.benchmark_suite(iterations=iterations)
+    lib.benchmarks.save_results(results, "benchmarks/results.json")
+
+    for name, seconds in sorted(results.items()):
+        print(f"{name}: {seconds * 1000:.3f} ms")
+
+    if save_baseline:
+        lib.benchmarks.save_results(results, "benchmarks/baseline.json")
+        return None
+
+    baseline = lib.benchmarks.load_results("benchmarks/baseline.json")
+
+    if baseline is None:
+        print("\nNo baseline found at 'benchmarks/baseline.json'. Run with --save-baseline to create one.")
+        return None
+
+    regressions = lib.benchmarks.compare_to_baseline(results, baseline, tolerance=tolerance)
+
+    print(f"\n{len(regressions)} regression(s) beyond {tolerance * 100:.0f}% of the baseline")
+
+    for name, regression in sorted(regressions.items()):
+        print(f"REGRESSION - {name}: {regression['baseline'] * 1000:.3f} ms -> {regression['current'] * 1000:.3f} ms ({regression['ratio']:.2f}x)")
+
+    if len(regressions):
+        exit(1)
+
+@task
+def check_context_downscale(ctx, downscale=4):
+    pprint(lib.benchmarks.check_context_downscale(downscale))
+
+@task
+def build_glyph_templates(ctx, path="datasets/ocr/characters", output_path=lib.benchmarks.GLYPH_TEMPLATES_PATH, label_with_classifier=False, min_score=0.5):
+    ocr_classifier = lib.benchmarks.load_ocr_classifier() if label_with_classifier else None
+
+    glyph_classifier = GlyphTemplateClassifier.from_dataset(path, ocr_classifier=ocr_classifier, min_score=min_score)
+    glyph_classifier.save(output_path)
+
+    print(f"Saved {len(glyph_classifier.labels)} glyph templates to '{output_path}'")
+
+@task
+def build_ocr_dataset(ctx, frames_path="datasets/ocr/frames", output_path="datasets/ocr/characters.npy", processes=0, mode="FAST"):
+    frame_paths = glob.glob(f"{frames_path}/*.png")
+
+    started_at = time.time()
+    dataset = lib.ocr_dataset.build_ocr_dataset(frame_paths, output_path=output_path, processes=processes or None, mode=mode)
+
+    print(f"Extracted {len(dataset)} character tokens from {len(frame_paths)} frames to '{output_path}' in {time.time() - started_at:.2f} seconds")
+
+@task
+def benchmark_ocr_engines(ctx, path="datasets/ocr/characters", holdout=0.2, iterations=10):
+    ocr_classifier = lib.benchmarks.load_ocr_classifier()
+    pprint(lib.benchmarks.benchmark_ocr_engines(ocr_classifier, labeled_path=path, holdout=holdout, iterations=iterations))
+
 @task
 def play(ctx):
     game = SuperHexagonGame()
     game.launch()
     game.play(game_agent_class_name="SuperHexagonGameAgent")
+
+@task
+def replay(ctx, path, frame_rate=0, loop=False, verbose=False):
+    game = SuperHexagonGame()
+    input_controller = LoggingInputController(verbose=verbose)
+
+    started_at = time.time()
+
+    game.play(
+        game_agent_class_name="SuperHexagonGameAgent",
+        frame_source=RecordedFrameSource(path, frame_rate=frame_rate, loop=loop),
+        input_controller=input_controller
+    )
+
+    elapsed = time.time() - started_at
+
+    pprint({
+        **game.frame_statistics,
+        "seconds": round(elapsed, 2),
+        "frames_per_second": round(game.frames_consumed / elapsed, 2),
+        "key_events": len(input_controller.events)
+    })
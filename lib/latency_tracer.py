@@ -0,0 +1,56 @@
+import time
+import json
+import collections
+
+import numpy as np
+
+
+class LatencyTracer:
+    """Frame staleness when the agent reads a frame and capture-to-keypress latency of the actions it triggers"""
+
+    def __init__(self, window_size=10000):
+        self.frame_staleness = collections.deque(maxlen=window_size)
+        self.action_latencies = collections.deque(maxlen=window_size)
+
+        self.actions = collections.deque(maxlen=window_size)
+
+    def record_frame(self, game_frame):
+        self.frame_staleness.append(time.time() - game_frame.timestamp)
+
+    def record_action(self, game_frame, key):
+        acted_at = time.time()
+
+        self.action_latencies.append(acted_at - game_frame.timestamp)
+        self.actions.append({"sequence_number": game_frame.sequence_number, "key": str(key), "latency": acted_at - game_frame.timestamp})
+
+    def reset(self):
+        self.frame_staleness.clear()
+        self.action_latencies.clear()
+        self.actions.clear()
+
+    def summary(self):
+        return {
+            "frame_staleness": self._distribution(self.frame_staleness),
+            "capture_to_action_latency": self._distribution(self.action_latencies)
+        }
+
+    def write(self, file_path):
+        with open(file_path, "w") as f:
+            f.write(json.dumps(self.summary()))
+
+    def _distribution(self, samples):
+        samples = np.array(samples)
+
+        if not samples.size:
+            return {"count": 0}
+
+        p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+
+        return {
+            "count": int(samples.size),
+            "mean": float(samples.mean()),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(samples.max())
+        }
@@ -13,6 +13,12 @@ import numpy as np
 
 import editdistance
 
+import lib.profiling
+
+from lib.config import config
+
+import collections
+import hashlib
 import uuid
 import pickle
 
@@ -22,19 +28,99 @@ WINDOWING_SHAPES = {
     "rectangle": rectangle
 }
 
+# Fuzzy query matching switches from a linear scan to a BK-tree above this many query words
+BK_TREE_MIN_VOCABULARY_SIZE = 16
+
+
+class OCRCache:
+    """Bounded LRU of recognized words keyed by a hash of the image pixels and the OCR parameters"""
+
+    def __init__(self, enabled=True, size=128):
+        self.enabled = enabled
+        self.size = size
+
+        self.entries = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, image, *parameters):
+        image = np.ascontiguousarray(image)
+
+        digest = hashlib.blake2b(repr((image.shape, image.dtype.str, parameters)).encode("utf-8"), digest_size=16)
+        digest.update(image.data)
+
+        return digest.digest()
+
+    def get(self, key, owner=None):
+        # Entries hold a reference to their owner (e.g. the classifier): an id() in the key alone can be reused after garbage collection
+        entry = self.entries.get(key)
+
+        if entry is None or entry[0] is not owner:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+
+        return entry[1]
+
+    def put(self, key, value, owner=None):
+        self.entries[key] = (owner, value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+        self.hits = 0
+        self.misses = 0
+
+    def statistics(self):
+        lookups = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "entries": len(self.entries),
+            "size": self.size
+        }
+
+
+cache = OCRCache(**((config.get("ocr") or dict()).get("cache") or dict()))
 
-def image_contains(image, query, ocr_classifier, fuzziness=0, word_window_shape="rectangle", word_window_size=(1, 5)):
-    words = words_in_image(image, ocr_classifier, word_window_shape=word_window_shape, word_window_size=word_window_size)
 
+def image_contains(image, query, ocr_classifier, fuzziness=0, word_window_shape="rectangle", word_window_size=(1, 5)):
     if isinstance(query, str):
         query = [query]
 
-    result = dict()
+    # Phrases are satisfied once each of their words has been seen
+    query_words = {phrase: phrase.lower().split() for phrase in query}
+    vocabulary = {word for words in query_words.values() for word in words}
+
+    match = query_word_matcher(vocabulary, fuzziness)
+    matched_words = set()
+
+    if len(vocabulary):
+        with lib.profiling.span("ocr.extract"):
+            character_and_word_data = extract_character_and_word_data(
+                image,
+                word_window_shape=word_window_shape,
+                word_window_size=word_window_size,
+                preprocess_mode="PRECISE"
+            )
 
-    for word in query:
-        result[word] = word.lower() in words
+        with lib.profiling.span("ocr.match"):
+            for word in recognize_words(character_and_word_data, ocr_classifier):
+                matched_words.update(match(word.lower()))
 
-    return result
+                if len(matched_words) == len(vocabulary):
+                    break
+
+    return {phrase: len(words) > 0 and all(word in matched_words for word in words) for phrase, words in query_words.items()}
 
 
 def image_region_contains(image, image_region, query, ocr_classifier, fuzziness=0, word_window_shape="rectangle", word_window_size=(1, 5)):
@@ -50,36 +136,135 @@ def image_region_contains(image, image_region, query, ocr_classifier, fuzziness=
     )
 
 
-def words_in_image(image, ocr_classifier, word_window_shape="rectangle", word_window_size=(1, 5)):
-    character_and_word_data = extract_character_and_word_data(
-        image,
-        word_window_shape=word_window_shape,
-        word_window_size=word_window_size,
-        preprocess_mode="PRECISE"
-    )
+def words_in_image(image, ocr_classifier, word_window_shape="rectangle", word_window_size=(1, 5), use_cache=True):
+    use_cache = use_cache and cache.enabled
+
+    if use_cache:
+        cache_key = cache.key(image, id(ocr_classifier), word_window_shape, word_window_size)
+        words = cache.get(cache_key, owner=ocr_classifier)
+
+        if words is not None:
+            return list(words)
 
-    characters = dict()
+    with lib.profiling.span("ocr.extract"):
+        character_and_word_data = extract_character_and_word_data(
+            image,
+            word_window_shape=word_window_shape,
+            word_window_size=word_window_size,
+            preprocess_mode="PRECISE"
+        )
 
-    for index, image_data in enumerate(character_and_word_data["character"]["image_data"]):
-        character_bounding_box = character_and_word_data["character"]["bounding_boxes"][index]
-        character = ocr_classifier.predict([image_data.flatten()])[0]
+    with lib.profiling.span("ocr.classify"):
+        characters = classify_characters(character_and_word_data["character"], ocr_classifier)
 
-        characters[character_bounding_box] = character
+    with lib.profiling.span("ocr.reconstruct"):
+        words = reconstruct_words(character_and_word_data["word"]["bounding_boxes"], characters)
 
-    return reconstruct_words(character_and_word_data["word"]["bounding_boxes"], characters)
+    if use_cache:
+        cache.put(cache_key, tuple(words), owner=ocr_classifier)
 
+    return words
 
-def words_in_image_region(image, image_region, ocr_classifier, word_window_shape="rectangle", word_window_size=(1, 5)):
+
+def words_in_image_region(image, image_region, ocr_classifier, word_window_shape="rectangle", word_window_size=(1, 5), use_cache=True):
     region_image = image[image_region[0]:image_region[2], image_region[1]:image_region[3]]
 
     return words_in_image(
         region_image,
         ocr_classifier,
         word_window_shape=word_window_shape,
-        word_window_size=word_window_size
+        word_window_size=word_window_size,
+        use_cache=use_cache
     )
 
 
+def words_in_image_regions(image, image_regions, ocr_classifier, word_window_shape="rectangle", word_window_size=(1, 5)):
+    regions_data = list()
+
+    with lib.profiling.span("ocr.extract"):
+        for image_region in image_regions:
+            region_image = image[image_region[0]:image_region[2], image_region[1]:image_region[3]]
+
+            regions_data.append(
+                extract_character_and_word_data(
+                    region_image,
+                    word_window_shape=word_window_shape,
+                    word_window_size=word_window_size,
+                    preprocess_mode="PRECISE"
+                )
+            )
+
+    with lib.profiling.span("ocr.classify"):
+        image_data = np.concatenate([region_data["character"]["image_data"] for region_data in regions_data]) if regions_data else list()
+        predictions = predict_characters(image_data, ocr_classifier)
+
+    words = list()
+    offset = 0
+
+    with lib.profiling.span("ocr.reconstruct"):
+        for region_data in regions_data:
+            bounding_boxes = region_data["character"]["bounding_boxes"]
+            characters = dict(zip(bounding_boxes, predictions[offset:offset + len(bounding_boxes)]))
+
+            offset += len(bounding_boxes)
+
+            words.append(reconstruct_words(region_data["word"]["bounding_boxes"], characters))
+
+    return words
+
+
+def classify_characters(character_data, ocr_classifier):
+    predictions = predict_characters(character_data["image_data"], ocr_classifier)
+    return dict(zip(character_data["bounding_boxes"], predictions))
+
+
+def predict_characters(image_data, ocr_classifier):
+    if not len(image_data):
+        return list()
+
+    return list(ocr_classifier.predict(np.reshape(image_data, (len(image_data), -1))))
+
+
+def recognize_words(character_and_word_data, ocr_classifier):
+    """Lazily yields the words of reconstruct_words, classifying characters one word at a time"""
+    character_bounding_boxes = character_and_word_data["character"]["bounding_boxes"]
+    character_image_data = character_and_word_data["character"]["image_data"]
+
+    word_bounding_boxes = character_and_word_data["word"]["bounding_boxes"]
+    word_bounding_box_index = BoundingBoxIndex(word_bounding_boxes)
+
+    word_characters = [list() for _ in word_bounding_boxes]
+
+    for index, bounding_box in enumerate(character_bounding_boxes):
+        for word_index in word_bounding_box_index.containing(bounding_box):
+            word_characters[word_index].append(index)
+
+    predictions = dict()
+
+    for character_indices in word_characters:
+        pending_indices = [index for index in character_indices if index not in predictions]
+
+        if len(pending_indices):
+            predictions.update(zip(pending_indices, predict_characters(character_image_data[pending_indices], ocr_classifier)))
+
+        character_data = [[character_bounding_boxes[index], predictions[index]] for index in character_indices if predictions[index] != ""]
+
+        if len(character_data):
+            yield assemble_word(character_data)
+
+
+def query_word_matcher(vocabulary, fuzziness=0):
+    """Returns a function mapping a recognized word to the vocabulary words within `fuzziness` edits of it"""
+    if fuzziness <= 0:
+        return lambda word: [word] if word in vocabulary else []
+
+    if len(vocabulary) > BK_TREE_MIN_VOCABULARY_SIZE:
+        bk_tree = BKTree(vocabulary)
+        return lambda word: bk_tree.search(word, fuzziness)
+
+    return lambda word: [query_word for query_word in vocabulary if editdistance.eval(word, query_word) <= fuzziness]
+
+
 def extract_character_and_word_data(image, word_window_shape="square", word_window_size=3, preprocess_mode="FAST"):
     preprocessed_image = preprocess_image(image, mode=preprocess_mode)
 
@@ -176,65 +361,54 @@ def detect_image_objects_closing(image, shape="square", window_size=3, merge=Fal
         return regions
 
 
-def normalize_objects(image, objects):
+def normalize_objects(image, objects, final_size=16):
     cleared_image = clear_border(image)
 
-    tokens = list()
-    final_size = (16, 16)
+    if not len(objects):
+        return np.zeros((0, final_size, final_size))
+
+    regions = np.array(objects, dtype=np.intp)
 
-    for region in objects:
-        width, height = [region[3] - region[1], region[2] - region[0]]
+    heights = regions[:, 2] - regions[:, 0]
+    widths = regions[:, 3] - regions[:, 1]
+    sizes = np.maximum(widths, heights)
 
-        token = cleared_image[region[0]:region[2], region[1]:region[3]]
+    # Each token is padded to a square at the bottom or right, then sampled at the nearest source pixel
+    samples = ((np.arange(final_size) + 0.5) * sizes[:, np.newaxis] / final_size).astype(np.intp)
 
-        if width > height:
-            diff = (width - height) - 1
-            i = 0
+    rows = samples[:, :, np.newaxis]
+    columns = samples[:, np.newaxis, :]
 
-            while i <= diff:
-                token = np.r_[token, np.zeros((1, width))]
-                i += 1
-        elif height > width:
-            diff = (height - width) - 1
-            i = 0
+    inside = (rows < heights[:, np.newaxis, np.newaxis]) & (columns < widths[:, np.newaxis, np.newaxis])
 
-            while i <= diff:
-                token = np.c_[token, np.zeros((height, 1))]
-                i += 1
+    pixels = cleared_image[
+        np.minimum(regions[:, 0, np.newaxis, np.newaxis] + rows, regions[:, 2, np.newaxis, np.newaxis] - 1),
+        np.minimum(regions[:, 1, np.newaxis, np.newaxis] + columns, regions[:, 3, np.newaxis, np.newaxis] - 1)
+    ]
 
-        token = skimage.transform.resize(token, output_shape=final_size, mode="reflect", order=0)
-        tokens.append(token)
+    tokens = np.zeros((len(regions), final_size, final_size))
+    np.copyto(tokens, pixels, where=inside)
 
     return tokens
 
 
 def remove_nested_bounding_boxes(bounding_boxes, remove="outer"):
-    bounding_box_blacklist = list()
+    bounding_box_index = BoundingBoxIndex(bounding_boxes)
+    bounding_box_blacklist = set()
 
     for i, bounding_box in enumerate(bounding_boxes):
-        for ii, outer_bounding_box in enumerate(bounding_boxes):
-            if i == ii:
-                continue
+        if i in bounding_box_blacklist:
+            continue
 
-            if i in bounding_box_blacklist or ii in bounding_box_blacklist:
+        for ii in bounding_box_index.containing(bounding_box):
+            if i == ii or ii in bounding_box_blacklist:
                 continue
 
-            is_contained = True
-
-            if bounding_box[0] < outer_bounding_box[0]:
-                is_contained = False
-
-            if bounding_box[1] < outer_bounding_box[1]:
-                is_contained = False
-
-            if bounding_box[2] > outer_bounding_box[2]:
-                is_contained = False
-
-            if bounding_box[3] > outer_bounding_box[3]:
-                is_contained = False
-
-            if is_contained:
-                bounding_box_blacklist.append(ii) if remove == "outer" else bounding_box_blacklist.append(i)
+            if remove == "outer":
+                bounding_box_blacklist.add(ii)
+            else:
+                bounding_box_blacklist.add(i)
+                break
 
     return [bounding_box for i, bounding_box in enumerate(bounding_boxes) if i not in bounding_box_blacklist]
 
@@ -245,37 +419,95 @@ def reconstruct_words(word_bounding_boxes, characters):
     for word_bounding_box in word_bounding_boxes:
         words[word_bounding_box] = list()
 
+    word_bounding_box_index = BoundingBoxIndex(word_bounding_boxes)
+
     for bounding_box, character in characters.items():
         if character == "":
             continue
 
         # Grouping
-        for word_bounding_box in word_bounding_boxes:
-            is_contained = True
+        for index in word_bounding_box_index.containing(bounding_box):
+            words[word_bounding_boxes[index]].append([bounding_box, character])
+
+    return [assemble_word(character_data) for word_bounding_box, character_data in words.items() if len(character_data) > 0]
 
-            if bounding_box[0] < word_bounding_box[0]:
-                is_contained = False
 
-            if bounding_box[1] < word_bounding_box[1]:
-                is_contained = False
+def assemble_word(character_data):
+    # Sorting
+    y_sorted = sorted(character_data, key=lambda cd: cd[0][0])
+    x_sorted = sorted(y_sorted, key=lambda cd: cd[0][1])
 
-            if bounding_box[2] > word_bounding_box[2]:
-                is_contained = False
+    return "".join(cd[1] for cd in x_sorted)
 
-            if bounding_box[3] > word_bounding_box[3]:
-                is_contained = False
 
-            if is_contained:
-                words[word_bounding_box].append([bounding_box, character])
+class BoundingBoxIndex:
+    """Sorted sweep over (min_row, min_col, max_row, max_col) boxes answering containment queries."""
 
-    # Sorting
-    for word_bounding_box, character_data in words.items():
-        y_sorted = sorted(character_data, key=lambda cd: cd[0][0])
-        x_sorted = sorted(y_sorted, key=lambda cd: cd[0][1])
+    def __init__(self, bounding_boxes):
+        boxes = np.array(bounding_boxes, dtype=np.intp).reshape(-1, 4)
+
+        self.order = np.argsort(boxes[:, 0], kind="mergesort")
+        self.sorted_boxes = boxes[self.order]
+
+    def containing(self, bounding_box):
+        # Only boxes starting at or above the query can contain it
+        end = np.searchsorted(self.sorted_boxes[:, 0], bounding_box[0], side="right")
+        candidates = self.sorted_boxes[:end]
+
+        is_contained = (
+            (candidates[:, 1] <= bounding_box[1]) &
+            (candidates[:, 2] >= bounding_box[2]) &
+            (candidates[:, 3] >= bounding_box[3])
+        )
+
+        return sorted(self.order[:end][is_contained].tolist())
+
+
+class BKTree:
+    """Burkhard-Keller tree over edit distance for looking up every word within a tolerance of a query"""
+
+    def __init__(self, words):
+        self.root = None
+
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        if self.root is None:
+            self.root = (word, dict())
+            return None
+
+        node_word, children = self.root
+
+        while True:
+            distance = editdistance.eval(word, node_word)
+
+            if distance == 0:
+                return None
+
+            if distance not in children:
+                children[distance] = (word, dict())
+                return None
+
+            node_word, children = children[distance]
+
+    def search(self, word, max_distance):
+        if self.root is None:
+            return list()
+
+        matches = list()
+        nodes = [self.root]
+
+        while len(nodes):
+            node_word, children = nodes.pop()
+            distance = editdistance.eval(word, node_word)
+
+            if distance <= max_distance:
+                matches.append(node_word)
 
-        words[word_bounding_box] = [cd[1] for cd in x_sorted]
+            nodes.extend(child for child_distance, child in children.items() if abs(child_distance - distance) <= max_distance)
 
-    return ["".join(sorted_characters) for word_bounding_box, sorted_characters in words.items() if len(sorted_characters) > 0]
+        return matches
 
 
 def save_objects(path, objects, normalized_objects, image_uuid):
@@ -0,0 +1,92 @@
+import os
+import json
+import uuid
+import multiprocessing
+
+import numpy as np
+
+import skimage.io
+
+import lib.ocr
+
+
+TOKEN_SIZE = 16
+
+TOKEN_DTYPE = np.dtype([
+    ("uuid", "S36"),
+    ("frame_index", np.int32),
+    ("bounding_box", np.int32, (4,)),
+    ("token", np.bool_, (TOKEN_SIZE, TOKEN_SIZE))
+])
+
+
+def build_ocr_dataset(frame_paths, output_path="datasets/ocr/characters.npy", processes=None, mode="FAST"):
+    """Extracts the character tokens of every frame across a process pool into one structured .npy file plus a JSON index"""
+    frame_paths = sorted(frame_paths)
+
+    with multiprocessing.Pool(processes=processes) as pool:
+        frame_tokens = pool.map(extract_frame_tokens, [(frame_path, mode) for frame_path in frame_paths], chunksize=4)
+
+    dataset = np.zeros(sum(len(tokens) for tokens in frame_tokens), dtype=TOKEN_DTYPE)
+    frames = list()
+
+    offset = 0
+
+    for frame_index, (frame_path, tokens) in enumerate(zip(frame_paths, frame_tokens)):
+        dataset[offset:offset + len(tokens)] = tokens
+        dataset["frame_index"][offset:offset + len(tokens)] = frame_index
+
+        frames.append({
+            "id": frame_id(frame_path),
+            "path": frame_path,
+            "offset": offset,
+            "count": len(tokens)
+        })
+
+        offset += len(tokens)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    np.save(output_path, dataset)
+
+    with open(index_path(output_path), "w") as f:
+        f.write(json.dumps({"tokens": len(dataset), "token_size": TOKEN_SIZE, "mode": mode, "frames": frames}, indent=4))
+
+    return dataset
+
+
+def extract_frame_tokens(arguments):
+    frame_path, mode = arguments
+
+    image = skimage.io.imread(frame_path)[..., :3]
+
+    preprocessed_image = lib.ocr.preprocess_image(image, mode=mode)
+    objects = lib.ocr.detect_image_objects_closing(preprocessed_image, shape="square", window_size=1)
+
+    tokens = np.zeros(len(objects), dtype=TOKEN_DTYPE)
+
+    if len(objects):
+        tokens["uuid"] = [str(uuid.uuid4()) for _ in objects]
+        tokens["bounding_box"] = objects
+        tokens["token"] = lib.ocr.normalize_objects(preprocessed_image, objects, final_size=TOKEN_SIZE) > 0
+
+    return tokens
+
+
+def load_ocr_dataset(path="datasets/ocr/characters.npy"):
+    """Memory-maps the token array and reads its index; tokens are only paged in when accessed"""
+    dataset = np.load(path, mmap_mode="r")
+
+    with open(index_path(path), "r") as f:
+        index = json.loads(f.read())
+
+    return dataset, index
+
+
+def frame_id(frame_path):
+    # datasets/ocr/frames/frame_{uuid}.png
+    return os.path.splitext(os.path.basename(frame_path))[0].replace("frame_", "", 1)
+
+
+def index_path(path):
+    return f"{os.path.splitext(path)[0]}.json"
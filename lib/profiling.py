@@ -0,0 +1,155 @@
+import time
+import json
+import cProfile
+import collections
+
+import numpy as np
+
+from redis import StrictRedis
+
+from lib.config import config
+
+
+class Span:
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+        self.started_at = None
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.record(self.name, time.perf_counter() - self.started_at)
+
+
+class NullSpan:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Profiler:
+    """Named timing spans with rolling per-stage latency percentiles, sampled cProfile runs and periodic export"""
+
+    def __init__(self, enabled=False, window_size=1000, cprofile_interval=0, export_interval=10, export_path=None, export_redis_key=None):
+        self.enabled = enabled
+
+        self.window_size = window_size
+        self.latencies = dict()
+
+        self.frame_count = 0
+
+        self.cprofile_interval = cprofile_interval
+        self.cprofile = None
+
+        self.export_interval = export_interval
+        self.export_path = export_path
+        self.export_redis_key = export_redis_key
+
+        self.exported_at = time.monotonic()
+
+        self.redis_client = None
+
+    def span(self, name):
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    def record(self, name, duration):
+        if name not in self.latencies:
+            self.latencies[name] = collections.deque(maxlen=self.window_size)
+
+        self.latencies[name].append(duration)
+
+    def frame(self, name="frame"):
+        """Span for a whole frame; also drives cProfile sampling and periodic exports"""
+        if not self.enabled:
+            return NULL_SPAN
+
+        return FrameSpan(self, name)
+
+    def statistics(self):
+        statistics = dict()
+
+        for name, latencies in list(self.latencies.items()):
+            latencies = np.array(latencies)
+
+            if not latencies.size:
+                continue
+
+            p50, p95, p99 = np.percentile(latencies, (50, 95, 99))
+
+            statistics[name] = {
+                "count": int(latencies.size),
+                "mean": float(latencies.mean()),
+                "p50": float(p50),
+                "p95": float(p95),
+                "p99": float(p99)
+            }
+
+        return statistics
+
+    def export(self):
+        statistics = self.statistics()
+
+        if self.export_path:
+            with open(self.export_path, "w") as f:
+                f.write(json.dumps(statistics))
+
+            if self.cprofile is not None:
+                self.cprofile.dump_stats(f"{self.export_path}.prof")
+
+        if self.export_redis_key and len(statistics):
+            if self.redis_client is None:
+                self.redis_client = StrictRedis(**config["redis"])
+
+            self.redis_client.hmset(self.export_redis_key, {name: json.dumps(stage) for name, stage in statistics.items()})
+
+        self.exported_at = time.monotonic()
+
+        return statistics
+
+    def _on_frame_start(self):
+        self.frame_count += 1
+
+        if self.cprofile_interval and self.frame_count % self.cprofile_interval == 0:
+            if self.cprofile is None:
+                self.cprofile = cProfile.Profile()
+
+            self.cprofile.enable()
+            return True
+
+        return False
+
+    def _on_frame_end(self, is_cprofiled):
+        if is_cprofiled:
+            self.cprofile.disable()
+
+        if self.export_interval and (time.monotonic() - self.exported_at) >= self.export_interval:
+            self.export()
+
+
+class FrameSpan(Span):
+
+    def __enter__(self):
+        self.is_cprofiled = self.profiler._on_frame_start()
+        return super().__enter__()
+
+    def __exit__(self, *args):
+        super().__exit__(*args)
+        self.profiler._on_frame_end(self.is_cprofiled)
+
+
+profiler = Profiler(**(config.get("profiling") or dict()))
+
+
+def span(name):
+    return profiler.span(name)
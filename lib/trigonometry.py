@@ -30,3 +30,49 @@ def distances_to_center(shape):
 def angles_to_center(shape):
     x, y = meshgrid_around_center_for_shape(shape)
     return np.rad2deg(np.arctan2(x, y)).astype("int16")
+
+
+def polar_angles(angle_count=360):
+    # Same convention and range as angles_to_center: -179 to 180 degrees, in steps of 360 / angle_count
+    return -179 + np.arange(angle_count) * (360 / angle_count)
+
+
+def polar_index_map(shape, angle_count=360, radius_count=None):
+    """Flat pixel indices of an (angles x radii) grid around the center of shape; -1 where a sample falls outside"""
+    center_y, center_x = shape[0] // 2, shape[1] // 2
+
+    if radius_count is None:
+        radius_count = int(np.ceil(np.hypot(center_y, center_x))) + 1
+
+    angles = np.deg2rad(polar_angles(angle_count))[:, np.newaxis]
+    radii = np.arange(radius_count)[np.newaxis, :]
+
+    rows = center_y + np.rint(radii * np.cos(angles)).astype("int64")
+    columns = center_x + np.rint(radii * np.sin(angles)).astype("int64")
+
+    is_inside = (rows >= 0) & (rows < shape[0]) & (columns >= 0) & (columns < shape[1])
+
+    return np.where(is_inside, rows * shape[1] + columns, -1)
+
+
+def polar_remap(frame, index_map, fill_value=0):
+    is_outside = index_map < 0
+
+    polar_frame = np.take(frame.ravel(), np.where(is_outside, 0, index_map))
+    polar_frame[is_outside] = fill_value
+
+    return polar_frame
+
+
+def first_obstacle_distances(polar_frame, min_radius=0, miss_distance=9999):
+    """Radius of the first lit sample for every angle of a binary polar frame, ignoring radii below min_radius"""
+    hits = polar_frame[:, int(np.ceil(min_radius)):]
+
+    # Nothing is sampled beyond min_radius (small frames or a large player radius)
+    if hits.shape[1] == 0:
+        return np.full(polar_frame.shape[0], miss_distance)
+
+    first_hits = hits.argmax(axis=1)
+    has_hit = hits[np.arange(hits.shape[0]), first_hits]
+
+    return np.where(has_hit, first_hits + int(np.ceil(min_radius)), miss_distance)
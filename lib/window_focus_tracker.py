@@ -0,0 +1,69 @@
+import Xlib.X
+import Xlib.error
+import Xlib.display
+
+import time
+
+import subprocess
+import shlex
+
+
+class WindowFocusTracker:
+    """Caches which window has the input focus, asking the X server directly at most once per TTL"""
+
+    def __init__(self, window_id=None, ttl=0.1):
+        self.window_id = int(window_id) if window_id else None
+        self.ttl = ttl
+
+        self.focused_window_id = None
+        self.refreshed_at = None
+
+        try:
+            self.display = Xlib.display.Display()
+            self.wm_state_atom = self.display.intern_atom("WM_STATE")
+        except Exception:
+            # Falls back to spawning xdotool
+            self.display = None
+
+    @property
+    def is_focused(self):
+        if self.refreshed_at is None or (time.monotonic() - self.refreshed_at) >= self.ttl:
+            self.refresh()
+
+        return self.focused_window_id == self.window_id
+
+    def refresh(self):
+        if self.display is not None:
+            try:
+                self.focused_window_id = self._focused_client_window_id()
+            except Xlib.error.XError:
+                # Transient (e.g. the focused window went away): keep the last known focus and retry on the next refresh
+                return self.focused_window_id
+        else:
+            self.focused_window_id = int(subprocess.check_output(shlex.split("xdotool getwindowfocus")).decode("utf-8").strip())
+
+        self.refreshed_at = time.monotonic()
+
+        return self.focused_window_id
+
+    def _focused_client_window_id(self):
+        focus = self.display.get_input_focus().focus
+
+        if isinstance(focus, int):
+            return focus
+
+        # Same as 'xdotool getwindowfocus': walk up from the focused window to the client (top-level) window
+        root = self.display.screen().root
+        window = focus
+
+        try:
+            while window is not None and window.id != root.id:
+                if window.get_full_property(self.wm_state_atom, Xlib.X.AnyPropertyType) is not None:
+                    return window.id
+
+                window = window.query_tree().parent
+        except Xlib.error.XError:
+            # A window in the chain was destroyed mid-walk (BadWindow)
+            pass
+
+        return focus.id
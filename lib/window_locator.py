@@ -0,0 +1,161 @@
+import Xlib.X
+import Xlib.display
+import Xlib.protocol.event
+
+import re
+import time
+
+import subprocess
+import shlex
+
+
+class WindowLocatorError(BaseException):
+    pass
+
+
+class WindowLocator:
+    """Finds, moves, activates and measures game windows by talking to the X server directly (xdotool as a fallback)"""
+
+    def __init__(self):
+        try:
+            self.display = Xlib.display.Display()
+            self.root = self.display.screen().root
+
+            self.net_wm_name_atom = self.display.intern_atom("_NET_WM_NAME")
+            self.net_active_window_atom = self.display.intern_atom("_NET_ACTIVE_WINDOW")
+        except Exception:
+            self.display = None
+            self.root = None
+
+    def locate(self, window_name, timeout=60, initial_delay=0.1, max_delay=1.0):
+        started_at = time.monotonic()
+        delay = initial_delay
+
+        while True:
+            window_id = self.search(window_name)
+
+            if window_id is not None:
+                return window_id
+
+            if (time.monotonic() - started_at) >= timeout:
+                raise WindowLocatorError(f"No window matching '{window_name}' appeared within {timeout} seconds...")
+
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+    def search(self, window_name):
+        # Case-insensitive regular expression match on the window name, like 'xdotool search --name'
+        if self.display is None:
+            try:
+                output = subprocess.check_output(shlex.split(f"xdotool search --name \"{window_name}\"")).decode("utf-8").strip()
+            except subprocess.CalledProcessError:
+                return None
+
+            return output.split("\n")[0] if output else None
+
+        pattern = re.compile(window_name, re.IGNORECASE)
+        windows = [self.root]
+
+        while len(windows):
+            window = windows.pop(0)
+
+            try:
+                name = self._window_name(window)
+
+                if name and pattern.search(name) and window.get_attributes().map_state == Xlib.X.IsViewable:
+                    return str(window.id)
+
+                windows.extend(window.query_tree().children)
+            except Exception:
+                # Windows can be destroyed while the tree is being walked
+                continue
+
+        return None
+
+    def move(self, window_id, x, y, settle_timeout=1.0):
+        if self.display is None:
+            return subprocess.call(shlex.split(f"xdotool windowmove {window_id} {x} {y}"))
+
+        window = self._window(window_id)
+
+        window.configure(x=x, y=y)
+        self.display.flush()
+
+        # The window manager applies the move asynchronously; wait for the top-level frame to settle before geometry is read
+        frame = self._top_level_frame(window)
+        started_at = time.monotonic()
+
+        while (time.monotonic() - started_at) < settle_timeout:
+            frame_geometry = frame.get_geometry()
+
+            if frame_geometry.x == x and frame_geometry.y == y:
+                break
+
+            time.sleep(0.01)
+
+    def activate(self, window_id):
+        if self.display is None:
+            return subprocess.call(shlex.split(f"xdotool windowactivate {window_id}"))
+
+        # EWMH activation request (source indication 2: pager / direct user action)
+        event = Xlib.protocol.event.ClientMessage(
+            window=self._window(window_id),
+            client_type=self.net_active_window_atom,
+            data=(32, [2, Xlib.X.CurrentTime, 0, 0, 0])
+        )
+
+        self.root.send_event(event, event_mask=Xlib.X.SubstructureRedirectMask | Xlib.X.SubstructureNotifyMask)
+        self.display.flush()
+
+    def geometry(self, window_id):
+        if self.display is None:
+            return self._xdotool_geometry(window_id)
+
+        window = self._window(window_id)
+
+        window_geometry = window.get_geometry()
+        absolute_coordinates = self.root.translate_coords(window, 0, 0)
+
+        return {
+            "width": window_geometry.width,
+            "height": window_geometry.height,
+            "x_offset": absolute_coordinates.x,
+            "y_offset": absolute_coordinates.y
+        }
+
+    def _window(self, window_id):
+        return self.display.create_resource_object("window", int(window_id))
+
+    def _top_level_frame(self, window):
+        while True:
+            parent = window.query_tree().parent
+
+            if parent is None or parent.id == self.root.id:
+                return window
+
+            window = parent
+
+    def _window_name(self, window):
+        net_wm_name = window.get_full_property(self.net_wm_name_atom, Xlib.X.AnyPropertyType)
+
+        if net_wm_name is not None:
+            name = net_wm_name.value
+        else:
+            name = window.get_wm_name()
+
+        return name.decode("utf-8", "ignore") if isinstance(name, bytes) else name
+
+    def _xdotool_geometry(self, window_id):
+        geometry = dict()
+
+        window_geometry = subprocess.check_output(shlex.split(f"xdotool getwindowgeometry {window_id}")).decode("utf-8").strip()
+        size = re.match(r"\s+Geometry: ([0-9]+x[0-9]+)", window_geometry.split("\n")[2]).group(1).split("x")
+
+        geometry["width"] = int(size[0])
+        geometry["height"] = int(size[1])
+
+        window_information = subprocess.check_output(shlex.split(f"xwininfo -id {window_id}")).decode("utf-8").strip()
+        geometry["x_offset"] = int(re.match(r"\s+Absolute upper-left X:\s+([0-9]+)", window_information.split("\n")[2]).group(1))
+        geometry["y_offset"] = int(re.match(r"\s+Absolute upper-left Y:\s+([0-9]+)", window_information.split("\n")[3]).group(1))
+
+        return geometry
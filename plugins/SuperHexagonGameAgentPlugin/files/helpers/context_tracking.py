@@ -0,0 +1,80 @@
+import numpy as np
+
+from .frame_processing import process_frame_for_context
+
+
+class ContextTracker:
+    """Re-classifies the context when a cheap frame signature changes (or every 'cadence' frames) with hysteresis on switches"""
+
+    def __init__(self, context_classifier, contexts, downscale=1, cadence=30, signature_threshold=2.0, confirmations=2):
+        self.context_classifier = context_classifier
+        self.contexts = contexts
+
+        self.downscale = downscale
+        self.cadence = cadence
+        self.signature_threshold = signature_threshold
+        self.confirmations = confirmations
+
+        self.context = "Unknown"
+
+        self.candidate_context = None
+        self.candidate_count = 0
+
+        self.signature = None
+        self.frames_since_classification = 0
+
+        self.classifications = 0
+        self.skipped_classifications = 0
+
+    @property
+    def statistics(self):
+        return {
+            "context": self.context,
+            "classifications": self.classifications,
+            "skipped_classifications": self.skipped_classifications
+        }
+
+    def update(self, gray_frame):
+        signature = gray_frame[::16, ::16].astype("int16")
+
+        signature_changed = self.signature is None or self.signature.shape != signature.shape or np.abs(signature - self.signature).mean() > self.signature_threshold
+
+        # Keep classifying while a new context is pending confirmation
+        if not signature_changed and self.candidate_context is None and self.frames_since_classification < self.cadence:
+            self.frames_since_classification += 1
+            self.skipped_classifications += 1
+
+            return self.context
+
+        self.signature = signature
+        self.frames_since_classification = 0
+
+        self._observe(self.classify(gray_frame))
+
+        return self.context
+
+    def classify(self, gray_frame):
+        processed_context_frame = process_frame_for_context(gray_frame, downscale=self.downscale)
+        context_prediction = self.context_classifier.predict([processed_context_frame])[0]
+
+        self.classifications += 1
+
+        return self.contexts.get(context_prediction, "Unknown")
+
+    def _observe(self, context):
+        if context == self.context:
+            self.candidate_context = None
+            self.candidate_count = 0
+            return None
+
+        if context == self.candidate_context:
+            self.candidate_count += 1
+        else:
+            self.candidate_context = context
+            self.candidate_count = 1
+
+        if self.candidate_count >= self.confirmations:
+            self.context = context
+
+            self.candidate_context = None
+            self.candidate_count = 0
@@ -8,21 +8,32 @@ import skimage.segmentation
 
 import numpy as np
 
+import lib.profiling
+
+from lib.grayscale import grayscale
+
 
 def image_data_for_screen_region(frame, screen_region):
     return frame[screen_region[0]:screen_region[2], screen_region[1]:screen_region[3]]
 
 
 def grayscale_frame(frame):
-    return np.array(skimage.color.rgb2gray(frame) * 255, dtype="uint8")
+    return grayscale(frame)
 
 
-def process_frame_for_context(frame):
+def process_frame_for_context(frame, downscale=1):
     """Assumes a grayscale frame"""
-    threshold = skimage.filters.threshold_local(frame, 21)
-    bw_frame = frame > threshold
+    with lib.profiling.span("frame_processing.context"):
+        if downscale > 1:
+            # Threshold the downsampled frame with a proportionally smaller (odd) block size
+            frame = frame[::downscale, ::downscale]
+            threshold = skimage.filters.threshold_local(frame, max(3, (21 // downscale) | 1))
+        else:
+            threshold = skimage.filters.threshold_local(frame, 21)
+
+        bw_frame = frame > threshold
 
-    return skimage.transform.resize(bw_frame, (30, 48), mode="reflect", order=0).astype("bool").flatten()
+        return skimage.transform.resize(bw_frame, (30, 48), mode="reflect", order=0).astype("bool").flatten()
 
 
 def process_frame_for_game_play(frame):
@@ -43,17 +54,87 @@ def process_frame_for_game_play(frame):
     return bw_frame
 
 
+class GamePlayFrameProcessor:
+    """Fused uint8 version of grayscale_frame + process_frame_for_game_play writing into buffers reused across frames"""
+
+    def __init__(self, shape, histogram_row_offset=40):
+        self.shape = tuple(shape[:2])
+        self.histogram_row_offset = histogram_row_offset
+
+        self.luma_buffer = np.empty(self.shape, dtype="uint32")
+        self.channel_buffer = np.empty(self.shape, dtype="uint32")
+
+        self.gray_frame = np.empty(self.shape, dtype="uint8")
+        self.suppressed_frame = np.empty(self.shape, dtype="uint8")
+        self.bw_frame = np.empty(self.shape, dtype="bool")
+
+        self.identity_lut = np.arange(256, dtype="uint8")
+        self.lut = self.identity_lut.copy()
+
+        self.gray_levels = np.arange(256, dtype="float64")
+
+    def grayscale(self, frame):
+        with lib.profiling.span("frame_processing.grayscale"):
+            return grayscale(frame, out=self.gray_frame, luma_buffer=self.luma_buffer, channel_buffer=self.channel_buffer)
+
+    def process(self, gray_frame):
+        """Assumes a grayscale frame. The returned frame is overwritten by the next call"""
+        with lib.profiling.span("frame_processing.game_play"):
+            histogram = np.bincount(gray_frame[self.histogram_row_offset:].ravel(), minlength=256)
+            gray_levels = np.flatnonzero(histogram)
+
+            lowest, highest = gray_levels[0], gray_levels[-1]
+
+            if np.unique(histogram[lowest:highest + 1]).size < 3:
+                return None
+
+            # Suppress the 2 darkest of the 3 most frequent gray levels (the background)
+            max_gray_levels = np.sort(np.argpartition(histogram[lowest:highest + 1], -3)[-3:] + lowest)[:2]
+
+            self.lut[:] = self.identity_lut
+            self.lut[max_gray_levels] = 0
+
+            np.take(self.lut, gray_frame, out=self.suppressed_frame, mode="clip")
+
+            # The suppressed histogram follows from the original one; no second pass over the frame is needed
+            histogram[0] += histogram[max_gray_levels].sum()
+            histogram[max_gray_levels] = 0
+
+            threshold = self._threshold_otsu(histogram)
+            np.greater(self.suppressed_frame, threshold, out=self.bw_frame)
+
+            return self.bw_frame
+
+    def _threshold_otsu(self, histogram):
+        # Same computation as skimage.filters.threshold_otsu over an integer image histogram
+        gray_levels = np.flatnonzero(histogram)
+
+        histogram = histogram[gray_levels[0]:gray_levels[-1] + 1].astype("float64")
+        bin_centers = self.gray_levels[gray_levels[0]:gray_levels[-1] + 1]
+
+        weight1 = np.cumsum(histogram)
+        weight2 = np.cumsum(histogram[::-1])[::-1]
+
+        mean1 = np.cumsum(histogram * bin_centers) / weight1
+        mean2 = (np.cumsum((histogram * bin_centers)[::-1]) / weight2[::-1])[::-1]
+
+        variance12 = weight1[:-1] * weight2[1:] * (mean1[:-1] - mean2[1:]) ** 2
+
+        return bin_centers[:-1][np.argmax(variance12)]
+
+
 def get_player_character_bounding_box(frame, screen_region):
-    player_area_frame = image_data_for_screen_region(frame, screen_region)
-    cleared_player_area_frame = skimage.segmentation.clear_border(player_area_frame)
+    with lib.profiling.span("frame_processing.player"):
+        player_area_frame = image_data_for_screen_region(frame, screen_region)
+        cleared_player_area_frame = skimage.segmentation.clear_border(player_area_frame)
 
-    label_image = skimage.measure.label(cleared_player_area_frame)
+        label_image = skimage.measure.label(cleared_player_area_frame)
 
-    player_character_bounding_box = None
+        player_character_bounding_box = None
 
-    for region in skimage.measure.regionprops(label_image):
-        if region.area < 200:
-            if region.bbox[0] > 50:
-                player_character_bounding_box = [c + screen_region[i % 2] for i, c in enumerate(list(region.bbox))]
+        for region in skimage.measure.regionprops(label_image):
+            if region.area < 200:
+                if region.bbox[0] > 50:
+                    player_character_bounding_box = [c + screen_region[i % 2] for i, c in enumerate(list(region.bbox))]
 
     return player_character_bounding_box
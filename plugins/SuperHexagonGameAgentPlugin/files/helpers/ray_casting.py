@@ -0,0 +1,48 @@
+import numpy as np
+
+
+class RayCaster:
+    """Per-angle flat pixel indices pre-sorted by distance to the center; a cast is a gather plus a first-hit search"""
+
+    def __init__(self, angles_to_center, distances_to_center, miss_distance=9999):
+        self.shape = angles_to_center.shape
+        self.miss_distance = miss_distance
+
+        flat_angles = angles_to_center.ravel()
+        flat_distances = distances_to_center.ravel()
+
+        order = np.lexsort((flat_distances, flat_angles))
+
+        sorted_angles = flat_angles[order]
+        sorted_distances = flat_distances[order]
+
+        angles, starts = np.unique(sorted_angles, return_index=True)
+        ends = np.r_[starts[1:], sorted_angles.size]
+
+        self.rays = dict()
+
+        for angle, start, end in zip(angles, starts, ends):
+            self.rays[int(angle)] = (order[start:end], sorted_distances[start:end])
+
+    def cast(self, frame, angle, min_distance=0):
+        """Distance to the first lit pixel of a binary frame along a ray, ignoring pixels closer than min_distance"""
+        ray = self.rays.get(int(angle))
+
+        if ray is None:
+            return self.miss_distance
+
+        indices, distances = ray
+        start = np.searchsorted(distances, min_distance, side="left")
+
+        hits = np.take(frame.ravel(), indices[start:])
+
+        if not hits.size:
+            return self.miss_distance
+
+        first_hit = hits.argmax()
+
+        return distances[start + first_hit] if hits[first_hit] else self.miss_distance
+
+    def cast_rays(self, frame, angles, min_distance=0):
+        frame = np.ascontiguousarray(frame)
+        return {label: self.cast(frame, angle, min_distance=min_distance) for label, angle in angles.items()}
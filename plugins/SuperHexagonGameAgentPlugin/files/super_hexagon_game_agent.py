@@ -2,6 +2,7 @@ from lib.game_agent import GameAgent
 
 import lib.ocr
 import lib.trigonometry
+import lib.profiling
 
 import offshoot
 
@@ -12,6 +13,8 @@ import subprocess
 from pprint import pprint
 
 from .helpers.frame_processing import *
+from .helpers.ray_casting import RayCaster
+from .helpers.context_tracking import ContextTracker
 
 
 class SuperHexagonGameAgent(GameAgent):
@@ -34,6 +37,20 @@ class SuperHexagonGameAgent(GameAgent):
         self.frame_angles_to_center = lib.trigonometry.angles_to_center(self.frame_shape)
         self.frame_distances_to_center = lib.trigonometry.distances_to_center(self.frame_shape)
 
+        self.ray_caster = RayCaster(self.frame_angles_to_center, self.frame_distances_to_center)
+
+        self.game_play_frame_processor = GamePlayFrameProcessor(self.frame_shape)
+
+        self.context_tracker = ContextTracker(
+            self.machine_learning_models["context_classifier"],
+            self.game_contexts,
+            # The context classifier was trained on full resolution frames; check other factors with `invoke check_context_downscale`
+            downscale=self.config.get("context_downscale") or 1,
+            cadence=self.config.get("context_cadence") or 30,
+            signature_threshold=self.config.get("context_signature_threshold") or 2.0,
+            confirmations=self.config.get("context_confirmations") or 2
+        )
+
         self.key_direction_mapping = {
             "+": self.input_controller.keyboard.left_key,
             "-": self.input_controller.keyboard.right_key
@@ -46,7 +63,8 @@ class SuperHexagonGameAgent(GameAgent):
             "max_keypress_duration": 0.04,
             "collision_threshold": 100,
             "max_run": 10,
-            "total_runs": 1
+            "total_runs": 1,
+            "latencies": {}
         }
 
     @property
@@ -59,12 +77,10 @@ class SuperHexagonGameAgent(GameAgent):
         )
 
     def handle_play(self, frame):
-        gray_frame = grayscale_frame(frame)
-
-        processed_context_frame = process_frame_for_context(gray_frame)
+        gray_frame = self.game_play_frame_processor.grayscale(frame)
 
-        context_prediction = self.machine_learning_models["context_classifier"].predict([processed_context_frame])[0]
-        context = self.game_contexts.get(context_prediction, "Unknown")
+        with lib.profiling.span("super_hexagon.context"):
+            context = self.context_tracker.update(gray_frame)
 
         if context == "Splash Screen":
             splash_action = " ".join(lib.ocr.words_in_image_region(
@@ -86,7 +102,7 @@ class SuperHexagonGameAgent(GameAgent):
             time.sleep(10 / 60)
         elif context == "Game Screen":
             # Preprocess
-            processed_frame_for_game_play = process_frame_for_game_play(gray_frame)
+            processed_frame_for_game_play = self.game_play_frame_processor.process(gray_frame)
 
             if processed_frame_for_game_play is None:
                 return None
@@ -103,8 +119,8 @@ class SuperHexagonGameAgent(GameAgent):
                 player_to_center_angle = self.frame_angles_to_center[player_bounding_box_center]
                 player_to_center_distance = self.frame_distances_to_center[player_bounding_box_center]
 
-                # Mask out center & player
-                processed_frame_for_game_play[self.frame_distances_to_center < (player_to_center_distance + (player_bounding_box[3] - player_bounding_box[1]))] = 0
+                # Ignore center & player
+                ray_min_distance = player_to_center_distance + (player_bounding_box[3] - player_bounding_box[1])
 
                 rays = {
                     "Ray Player + 180": (player_to_center_angle + 180 + 179) % 360 - 179,
@@ -121,26 +137,12 @@ class SuperHexagonGameAgent(GameAgent):
                     "Ray Player - 150": (player_to_center_angle - 150 + 179) % 360 - 179
                 }
 
-                ray_collision_distances = {
-                    "Ray Player + 180": None,
-                    "Ray Player + 150": None,
-                    "Ray Player + 120": None,
-                    "Ray Player + 90": None,
-                    "Ray Player + 60": None,
-                    "Ray Player + 30": None,
-                    "Ray Player": None,
-                    "Ray Player - 30": None,
-                    "Ray Player - 60": None,
-                    "Ray Player - 90": None,
-                    "Ray Player - 120": None,
-                    "Ray Player - 150": None
-                }
-
-                for label, angle in rays.items():
-                    ray_collision_mask = ((self.frame_angles_to_center == angle) & (processed_frame_for_game_play == 1))
-                    collision_distances = self.frame_distances_to_center[ray_collision_mask == True]
-
-                    ray_collision_distances[label] = np.min(collision_distances) if collision_distances.size else 9999
+                with lib.profiling.span("super_hexagon.ray_casting"):
+                    ray_collision_distances = self.ray_caster.cast_rays(
+                        processed_frame_for_game_play,
+                        rays,
+                        min_distance=ray_min_distance
+                    )
 
                 if ray_collision_distances["Ray Player"] <= 250:
                     best_ray = max(ray_collision_distances.items(), key=lambda i: i[1])[0]
@@ -150,6 +152,11 @@ class SuperHexagonGameAgent(GameAgent):
 
                     direction, magnitude = best_ray.split(" ")[2:]
 
+                    # A newer decision overrides a hold still in flight in the opposite direction
+                    for other_direction, key in self.key_direction_mapping.items():
+                        if other_direction != direction:
+                            self.input_controller.cancel_hold(key)
+
                     self.input_controller.tap_key(
                         self.key_direction_mapping[direction],
                         duration=(int(magnitude) / 15) * self.game_state["keypress_duration"]
@@ -187,6 +194,12 @@ class SuperHexagonGameAgent(GameAgent):
             with open(f"scores_{self.game_state['collision_threshold']}_hexagon.json", "w") as f:
                 f.write(json.dumps(score_averages))
 
+            self.game_state["latencies"][self.game_state["total_runs"]] = self.game.latency_tracer.summary()
+            self.game.latency_tracer.reset()
+
+            with open(f"latencies_{self.game_state['collision_threshold']}_hexagon.json", "w") as f:
+                f.write(json.dumps(self.game_state["latencies"]))
+
             if len(self.game_state["scores"]["%.4f" % self.game_state["keypress_duration"]]) >= self.game_state["max_run"]:
                 self.game_state["keypress_duration"] += 0.0005
 
@@ -194,6 +207,7 @@ class SuperHexagonGameAgent(GameAgent):
                     self.game_state["keypress_duration"] = 0.001
                     self.game_state["collision_threshold"] += 20
                     self.game_state["scores"] = {}
+                    self.game_state["latencies"] = {}
 
             self.input_controller.tap_key(self.input_controller.keyboard.escape_key)
             self.game_state["total_runs"] += 1
@@ -11,7 +11,8 @@ class SuperHexagonGame(Game):
         kwargs["app_id"] = "221640"
 
         kwargs["window_name"] = "Super Hexagon"
-        kwargs["frame_rate"] = config["SuperHexagonGamePlugin"].get("frame_rate") or 10
+        kwargs["frame_rate"] = config["SuperHexagonGamePlugin"].get("frame_rate", 60)
+        kwargs["capture_plan"] = config["SuperHexagonGamePlugin"].get("capture_plan")
 
         super().__init__(**kwargs)
 
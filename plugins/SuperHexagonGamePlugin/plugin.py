@@ -12,7 +12,7 @@ class SuperHexagonGamePlugin(offshoot.Plugin):
     ]
 
     config = {
-        "frame_rate": 10
+        "frame_rate": 60
     }
 
     @classmethod